@@ -0,0 +1,191 @@
+import math
+
+
+# Observations needed in a category before anything is flagged
+MIN_SAMPLES = 5
+# How many standard deviations above the running mean counts as an outlier
+Z_THRESHOLD = 3.0
+EWMA_ALPHA = 0.1
+# Spread never taken as less than this fraction of the typical amount, or this many dollars,
+# so repeated identical charges don't make a small change look extreme
+MIN_SPREAD_FRACTION = 0.1
+MIN_SPREAD = 1.0
+# Nothing under this multiple of the typical amount is flagged, however steady the history
+MIN_RATIO = 1.5
+SKETCH_QUANTILE = 0.95
+
+
+class P2Quantile:
+    """Streaming quantile estimate using the P-square algorithm.
+
+    Keeps five markers regardless of how many values are seen, so each
+    update is O(1) in time and memory (Jain & Chlamtac, 1985).
+    """
+
+    def __init__(self, p=SKETCH_QUANTILE):
+        self.p = p
+        self._initial = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+        self._increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def value(self):
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        ordered = sorted(self._initial)
+        return ordered[min(int(self.p * len(ordered)), len(ordered) - 1)]
+
+    def update(self, x):
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._positions = [1, 2, 3, 4, 5]
+                p = self.p
+                self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+            return
+
+        q, n = self._heights, self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self._desired
+        inc = self._increments
+        desired[1] += inc[1]
+        desired[2] += inc[2]
+        desired[3] += inc[3]
+        desired[4] += 1
+
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Piecewise-parabolic prediction, falling back to linear
+                candidate = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+
+class CategoryStats:
+    """Running statistics for one expense category, updated in O(1)."""
+
+    def __init__(self, alpha=EWMA_ALPHA, quantile=SKETCH_QUANTILE):
+        self.alpha = alpha
+        self.count = 0
+        # Welford accumulators
+        self.mean = 0.0
+        self._m2 = 0.0
+        # Exponentially weighted mean/variance track recent spending habits
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.sketch = P2Quantile(quantile)
+
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+    @property
+    def ewm_std(self):
+        return math.sqrt(self.ewm_var)
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+        if self.count == 1:
+            self.ewma = x
+        else:
+            diff = x - self.ewma
+            incr = self.alpha * diff
+            self.ewma += incr
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * incr)
+
+        self.sketch.update(x)
+
+
+class Anomaly:
+    """An expense that stands out against its category's history."""
+
+    def __init__(self, category, amount, typical, z_score, quantile):
+        self.category = category
+        self.amount = amount
+        self.typical = typical
+        self.z_score = z_score
+        self.quantile = quantile
+
+    def message(self):
+        ratio = self.amount / self.typical if self.typical > 0 else float("inf")
+        return (
+            f"⚠️ That's unusually high for {self.category}: ${self.amount:.2f} "
+            f"vs a typical ${self.typical:.2f} ({ratio:.1f}x your recent average)."
+        )
+
+
+class AnomalyDetector:
+    """Flags expenses that are far above their category's running statistics.
+
+    Each expense is scored against the statistics gathered *before* it, so a
+    single large charge cannot mask itself. Nothing here looks at the ledger;
+    all state lives in one CategoryStats per category.
+    """
+
+    def __init__(self, min_samples=MIN_SAMPLES, z_threshold=Z_THRESHOLD,
+                 alpha=EWMA_ALPHA, quantile=SKETCH_QUANTILE):
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.alpha = alpha
+        self.quantile = quantile
+        self.stats = {}
+
+    def check(self, category, amount):
+        """Score an amount against a category without recording it."""
+        stats = self.stats.get(category)
+        if stats is None or stats.count < self.min_samples:
+            return None
+
+        # Use the wider of the long-run and recent spread, floored so a quiet
+        # stretch of identical charges does not make every change look extreme
+        reference = max(stats.mean, stats.ewma)
+        spread = max(stats.std, stats.ewm_std, MIN_SPREAD_FRACTION * reference, MIN_SPREAD)
+        threshold = stats.sketch.value()
+        z_score = (amount - reference) / spread
+
+        if z_score >= self.z_threshold and amount > threshold and amount >= MIN_RATIO * reference:
+            return Anomaly(category, amount, stats.ewma, z_score, threshold)
+        return None
+
+    def observe(self, category, amount):
+        """Score an amount, then fold it into the category's statistics."""
+        amount = float(amount)
+        anomaly = self.check(category, amount)
+        stats = self.stats.get(category)
+        if stats is None:
+            stats = self.stats[category] = CategoryStats(self.alpha, self.quantile)
+        stats.update(amount)
+        return anomaly
+
+    def observe_many(self, rows):
+        """Feed (category, amount) pairs in order, returning any anomalies."""
+        observe = self.observe
+        return [a for a in (observe(c, x) for c, x in rows) if a is not None]
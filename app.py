@@ -1,14 +1,31 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import functools
 import requests
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
 import json
-import time
 import re
 import yfinance as yf
 
+from expense_store import ExpenseStore, GRANULARITIES, DEFAULT_PAGE_SIZE
+from anomaly import AnomalyDetector
+from budget_tracker import BudgetTracker
+from intents import build_prompt, keyword_intent, SYSTEM_INSTRUCTION as INTENT_SYSTEM_INSTRUCTION
+from jobs import JobQueue, WorkerPool
+from expense_parser import EXPENSE_CATEGORIES, parse_expense_message, parse_bulk
+from ledger_query import answer_question
+from recurring import FREQUENCIES, RecurringRule, RecurringSchedule, combined_category_totals, combined_chart_series, merge_rollups
+from fx import BASE_CURRENCY, format_money, load_rates
+from idle_sessions import IdleSessionManager
+from cassettes import Cassette, httpx_client, requests_session
+from price_history import HISTORY_DAYS, PriceHistory, chart_coins, chart_spec
+from exports import MIME_TYPES, formats as export_formats, spooled_export
+from degraded import CircuitBreaker, CircuitOpenError, SnapshotStore, DEGRADED_REPLY, describe_age, template_investment_tips
+from notifications import FINANCIAL_TIPS, SUMMARY_JOB, TIPS_JOB, register_handlers, session_summary_payload, tips_payload
+
 
 # Page configuration
 st.set_page_config(
@@ -21,14 +38,23 @@ st.set_page_config(
 # --- Setup ---
 load_dotenv()
 
+# Record/replay of model and market-data traffic (FINANCEBOT_CASSETTES), off by default
+@st.cache_resource
+def get_cassette():
+    return Cassette.from_env()
+
 # GitHub models setup
 token = os.environ.get("GITHUB_TOKEN")
+if not token and get_cassette() is not None and get_cassette().mode == "replay":
+    # Replayed conversations never reach the real endpoint
+    token = "replay"
 if not token:
     st.error("GITHUB_TOKEN not found in environment variables!")
     st.stop()
     
-endpoint = "https://models.inference.ai.azure.com"
-model_name = "gpt-4o"
+# Overridable so load tests and local development can point at a stub server
+endpoint = os.environ.get("MODELS_ENDPOINT", "https://models.inference.ai.azure.com")
+model_name = os.environ.get("MODEL_NAME", "gpt-4o")
 
 
 coingecko_api_url = os.environ.get("COINGECKO_API_URL")
@@ -45,21 +71,109 @@ if not coingecko_api_url:
 
 
 
+# Upstream calls give up quickly; the circuit breakers below take it from there
+model_timeout = float(os.environ.get("MODEL_TIMEOUT", 20))
+price_timeout = float(os.environ.get("PRICE_TIMEOUT", 3))
+
 # Initialize OpenAI client
 @st.cache_resource
 def get_openai_client():
     return OpenAI(
         base_url=endpoint,
         api_key=token,
+        timeout=model_timeout,
+        max_retries=1,
+        http_client=httpx_client(get_cassette(), model_timeout) if get_cassette() is not None else None,
     )
 
 client = get_openai_client()
 
+# Market data and exchange rates share one session so cassettes cover them too
+@st.cache_resource
+def get_http_session():
+    return requests_session(get_cassette())
+
+# Health of each upstream, shared by every session; recent and last good
+# answers are shared by every process on the host (see shared_cache.py)
+@st.cache_resource
+def get_upstreams():
+    return {
+        "models": CircuitBreaker("models", slow_call=model_timeout / 2),
+        "coingecko": CircuitBreaker("coingecko", slow_call=price_timeout),
+    }
+
+@st.cache_resource
+def get_snapshots():
+    return SnapshotStore()
+
+# Crypto price history, cached on disk and extended incrementally
+@st.cache_resource
+def get_price_history():
+    return PriceHistory(
+        session=get_http_session(),
+        api_base=coingecko_api_url.rsplit("/simple/", 1)[0],
+        timeout=price_timeout,
+        call=get_upstreams()["coingecko"].call
+    )
+
+# Background email jobs, shared by every session in this server process
+@st.cache_resource
+def get_job_queue():
+    queue = JobQueue()
+    register_handlers(WorkerPool(queue, workers=int(os.environ.get("JOB_WORKERS", 2)))).start()
+    return queue
+
+# Exchange rates, refreshed at most hourly and shared by every session.
+# Tables are immutable, so store aggregates memoize per rate snapshot.
+@st.cache_resource(ttl=3600)
+def get_fx_table():
+    return load_rates(session=get_http_session())
+
+# Spills idle sessions' ledgers and chat histories to disk, shared by every session
+@st.cache_resource
+def get_session_manager():
+    return IdleSessionManager().start()
+
+def session_scope():
+    ctx = get_script_run_ctx()
+    return get_session_manager().using(ctx.session_id if ctx else "local", st.session_state)
+
+def in_session(func):
+    """Run a callback or fragment with its session restored and pinned in memory.
+
+    Callbacks and fragment reruns run without the full script, so each one
+    restores a spilled session itself.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with session_scope():
+            return func(*args, **kwargs)
+    return wrapper
+
+def enqueue_job(kind, payload):
+    # Emails are best effort; a queue problem must never break the chat
+    try:
+        get_job_queue().enqueue(kind, payload)
+        return True
+    except Exception as e:
+        st.warning(f"Could not schedule email: {str(e)}")
+        return False
+
 # Initialize session state
 if "user_data" not in st.session_state:
     st.session_state.user_data = {"name": "", "email": "", "income": 0}
 if "expenses" not in st.session_state:
-    st.session_state.expenses = pd.DataFrame(columns=["Category", "Amount", "Date"])
+    st.session_state.expenses = ExpenseStore()
+if "anomaly_detector" not in st.session_state:
+    st.session_state.anomaly_detector = AnomalyDetector()
+if "budget_tracker" not in st.session_state:
+    st.session_state.budget_tracker = None
+if "recurring" not in st.session_state:
+    st.session_state.recurring = RecurringSchedule()
+if "show_report" not in st.session_state:
+    st.session_state.show_report = False
+if "show_expense_form" not in st.session_state:
+    st.session_state.show_expense_form = False
 if "convo_active" not in st.session_state:
     st.session_state.convo_active = False
 if "chat_history" not in st.session_state:
@@ -70,25 +184,73 @@ if "consent" not in st.session_state:
     st.session_state.consent = None
 if "error_count" not in st.session_state:
     st.session_state.error_count = 0
+if "display_currency" not in st.session_state:
+    st.session_state.display_currency = BASE_CURRENCY
 
 # --- Helper function to use GitHub's model ---
-def get_ai_response(prompt, system_instruction="You are a helpful financial assistant."):
+def ask_model(prompt, system_instruction):
+    """Call the model through its circuit breaker; raises if it is down or fails."""
+    # Any worker process may already have answered this exact prompt recently
+    snapshots = get_snapshots()
+    cached = snapshots.fresh_answer(system_instruction, prompt)
+    if cached is not None:
+        return cached
+    
+    response = get_upstreams()["models"].call(
+        client.chat.completions.create,
+        messages=[
+            {"role": "system", "content": system_instruction},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.2,
+        max_tokens=300,
+        model=model_name
+    )
+    answer = response.choices[0].message.content
+    snapshots.save_answer(system_instruction, prompt, answer)
+    return answer
+
+def get_ai_response(prompt, system_instruction="You are a helpful financial assistant.", fallback=None):
     try:
         with st.status("Processing your request...", expanded=False) as status:
-            response = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=300,
-                model=model_name
-            )
+            answer = ask_model(prompt, system_instruction)
             status.update(label="Response ready!", state="complete", expanded=False)
-            return response.choices[0].message.content
+            return answer
     except Exception as e:
-        st.error(f"Sorry, I encountered an issue: {str(e)}")
-        return "I apologize, but I'm having trouble processing your request right now. Could you try again or ask me something else?"
+        if not isinstance(e, CircuitOpenError):
+            st.error(f"Sorry, I encountered an issue: {str(e)}")
+    
+    # Degraded mode: the last answer to this exact prompt, then a local template
+    saved = get_snapshots().answer(system_instruction, prompt)
+    if saved is not None:
+        answer, age = saved
+        return f"{answer}\n\n_(Saved answer from {describe_age(age)}; the advisor model is unavailable right now.)_"
+    return fallback or DEGRADED_REPLY
+
+def get_btc_price(currency):
+    """Return (price, age in seconds); the age is 0 for a live or recently cached price and None if unknown."""
+    snapshots = get_snapshots()
+    price = snapshots.fresh_price("bitcoin", currency)
+    if price is not None:
+        return price, 0.0
+    
+    def fetch():
+        # Status and body checks run inside the breaker, so 429s, 5xx and bad bodies count as failures
+        response = get_http_session().get(
+            coingecko_api_url,
+            params={"ids": "bitcoin", "vs_currencies": currency.lower()},
+            timeout=price_timeout
+        )
+        response.raise_for_status()
+        return response.json()["bitcoin"][currency.lower()]
+    
+    try:
+        price = get_upstreams()["coingecko"].call(fetch)
+    except Exception:
+        saved = snapshots.last_price("bitcoin", currency)
+        return saved if saved is not None else (None, None)
+    snapshots.save_price("bitcoin", currency, price)
+    return price, 0.0
 
 
 
@@ -120,6 +282,7 @@ def submit_user_info():
             "email": st.session_state.email_input,
             "income": float(st.session_state.income_input)
         }
+        st.session_state.budget_tracker = new_budget_tracker()
         st.session_state.convo_active = True
         st.rerun()
     else:
@@ -133,11 +296,27 @@ def submit_user_info():
             
 
 # Callback for when user submits a message
+@in_session
 def submit_message():
     if st.session_state.message:
         user_input = st.session_state.message
         st.session_state.message = ""  # Clear the input
         
+        # Plain expense logs ("I spent $42 on groceries") are handled locally,
+        # with no model call and no form round trip
+        if log_parsed_expenses(user_input):
+            return
+        
+        # Questions about logged spending are answered from the ledger indexes
+        answer = answer_question(
+            user_input, st.session_state.expenses,
+            currency=st.session_state.display_currency, fx=get_fx_table(),
+            recurring=st.session_state.recurring
+        )
+        if answer:
+            st.session_state.chat_history.append((user_input, answer))
+            return
+        
         # Add message to chat history
         try:
             intent = classify_intent(user_input)
@@ -151,72 +330,184 @@ def submit_message():
             # If multiple errors in a row, provide more guidance
             if st.session_state.error_count >= 3:
                 st.info("Try asking about budgeting, expenses, investments, or type 'help' for suggestions.")
-                
-        st.rerun()
 
 # Set user consent
 def set_consent(value):
     st.session_state.consent = value
     if value:
-        st.success("Thank you for your consent! I'll send you occasional financial tips.")
+        enqueue_job(TIPS_JOB, tips_payload(st.session_state.user_data))
+    # Toasts fade on their own, so the callback never has to wait for them
+    if value:
+        st.toast("Thank you for your consent! I'll send you occasional financial tips.", icon="✅")
     else:
-        st.info("No problem! I won't send any marketing emails.")
-    time.sleep(1.5)
-    st.rerun()
+        st.toast("No problem! I won't send any marketing emails.", icon="ℹ️")
 
 # --- Intent Recognition ---
 def classify_intent(query):
-    prompt = f"""Classify this finance-related query into one of:
-    - budget_setup: Setting or adjusting budgets.
-    - add_expense: Logging expenses or tracking spending.
-    - investment_tips: Advice on stocks, crypto, retirement or any investments.
-    - view_report: Summary of expenses/budgets or financial reports.
-    - help: User needs assistance or examples of what they can ask.
-    - goodbye: Ending the chat or expressing thanks/farewell.
-    - other: Queries not clearly matching the above categories.
-
-    User query: {query}
-    Intent:"""
-    
-    intent = get_ai_response(
-        prompt, 
-        "You are a finance intent classifier. Respond with only the intent label in lowercase, no explanation."
-    ).strip().lower()
+    # Labels are saved per query so repeats, and outages, need no model call
+    snapshots = get_snapshots()
+    intent = snapshots.intent(query)
+    if intent is not None:
+        return intent
     
+    try:
+        # The prompt lives in intents.py so intent_eval.py scores exactly what the app sends
+        intent = ask_model(build_prompt(query), INTENT_SYSTEM_INSTRUCTION).strip().lower()
+    except Exception:
+        # Keyword routing still reaches the budget, expense, report and help answers
+        return keyword_intent(query)
+    snapshots.save_intent(query, intent)
     return intent
 
 # --- Handle Finance-Specific Logic ---
+def record_expense(category, amount, date=None, currency=BASE_CURRENCY):
+    # Appending to the store also updates the daily/weekly/monthly rollups;
+    # the ledger keeps the amount in the currency it was spent in
+    date = date or pd.Timestamp.now().date()
+    st.session_state.expenses.add(category, amount, date, currency)
+    
+    # Budgets and spending statistics are in dollars, so convert once here
+    amount = get_fx_table().convert(amount, currency, BASE_CURRENCY)
+    
+    # Keep budget-vs-actual totals current without rereading the ledger
+    if st.session_state.budget_tracker is None:
+        st.session_state.budget_tracker = new_budget_tracker()
+    st.session_state.budget_tracker.add(category, amount, date)
+    
+    # Score against the category's running statistics, returns None if it looks normal
+    return st.session_state.anomaly_detector.observe(category, amount)
+
+def confirm_expense(category, amount, anomaly, date=None, currency=BASE_CURRENCY):
+    shown = format_money(amount, currency)
+    if currency != BASE_CURRENCY:
+        shown += f" (≈ {format_money(get_fx_table().convert(amount, currency, BASE_CURRENCY))})"
+    if date is not None and date != pd.Timestamp.now().date():
+        response = f"✅ Added {shown} to {category} on {date:%b %d}."
+    else:
+        response = f"✅ Added {shown} to {category}."
+    allowance = st.session_state.budget_tracker.allowances.get(category)
+    if allowance:
+        spent = st.session_state.budget_tracker.spent(category) + recurring_this_month().get(category, 0.0)
+        remaining = allowance - spent
+        if remaining >= 0:
+            response += f" You have ${remaining:.2f} left for {category} this month."
+        else:
+            response += f" You're ${-remaining:.2f} over your {category} budget this month."
+    if anomaly:
+        response += f"\n\n{anomaly.message()}"
+    return response
+
+@in_session
 def handle_expenses():
     if st.session_state.expense_category and st.session_state.expense_amount > 0:
-        # Get current date in string format
-        current_date = pd.Timestamp.now().strftime('%Y-%m-%d')
-        
-        new_expense = pd.DataFrame([[
-            st.session_state.expense_category, 
+        currency = st.session_state.expense_currency
+        anomaly = record_expense(
+            st.session_state.expense_category,
             st.session_state.expense_amount,
-            current_date
-        ]], columns=["Category", "Amount", "Date"])
-        
-        st.session_state.expenses = pd.concat(
-            [st.session_state.expenses, new_expense], 
-            ignore_index=True
+            currency=currency
         )
         
-        response = f"✅ Added ${st.session_state.expense_amount:.2f} to {st.session_state.expense_category}."
+        response = confirm_expense(st.session_state.expense_category, st.session_state.expense_amount, anomaly, currency=currency)
         st.session_state.chat_history.append((
-            st.session_state.current_message, 
+            f"Add {format_money(st.session_state.expense_amount, currency)} to {st.session_state.expense_category}",
             response
         ))
         
+        # Sidebar budget figures changed, so the form panel asks for a full rerun
+        st.session_state.expense_added = True
+        
         # Clear form
-        st.session_state.expense_category = ""
         st.session_state.expense_amount = 0
-        
-        # Clear current message
-        st.session_state.current_message = None
-        st.session_state.current_intent = None
+
+def log_parsed_expenses(user_input):
+    """Record expenses parsed from a chat message. Returns False if the message isn't an expense log."""
+    parsed = parse_expense_message(user_input)
+    if parsed is None:
+        return False
+    
+    if parsed.ambiguous:
+        # Not sure enough to write anything, so hand over to the form
+        st.session_state.show_expense_form = True
+        if parsed.amount_hint:
+            st.session_state.expense_amount = parsed.amount_hint
+        st.session_state.chat_history.append((
+            user_input,
+            f"{parsed.reason} Please confirm the details in the expense form below."
+        ))
+        return True
+    
+    responses = []
+    for expense in parsed.expenses:
+        # Amounts without a currency marker are taken to be in the display currency
+        currency = expense.currency or st.session_state.display_currency
+        anomaly = record_expense(expense.category, expense.amount, expense.date, currency)
+        responses.append(confirm_expense(expense.category, expense.amount, anomaly, expense.date, currency))
+    st.session_state.chat_history.append((user_input, "\n\n".join(responses)))
+    st.session_state.expense_added = True
+    return True
+
+# --- Recurring Expenses ---
+def recurring_this_month():
+    """Recurring spend per category (in USD) that has fallen due this month."""
+    today = pd.Timestamp.now().date()
+    totals = st.session_state.recurring.totals_between(today.replace(day=1), today, fx=get_fx_table())
+    return {category: amount for category, (amount, _) in totals.items()}
+
+@in_session
+def add_recurring_rule():
+    if st.session_state.recurring_amount <= 0:
+        st.toast("Enter an amount for the recurring expense.", icon="⚠️")
+        return
+    rule = RecurringRule(
+        st.session_state.recurring_category,
+        st.session_state.recurring_amount,
+        st.session_state.recurring_start,
+        st.session_state.recurring_frequency,
+        st.session_state.recurring_interval,
+        currency=st.session_state.recurring_currency,
+        name=st.session_state.recurring_name or None
+    )
+    st.session_state.recurring.add(rule)
+    st.session_state.chat_history.append((f"Add recurring {rule.name}", f"🔁 Added {rule.describe()}."))
+    st.session_state.recurring_amount = 0
+    st.session_state.recurring_name = ""
+    st.session_state.expense_added = True
+
+@in_session
+def remove_recurring_rule(index):
+    rule = st.session_state.recurring.rules[index]
+    st.session_state.recurring.remove(index)
+    st.session_state.chat_history.append((f"Remove recurring {rule.name}", f"Removed {rule.describe()}."))
+    st.session_state.expense_added = True
+
+def recurring_expense_panel():
+    currencies = get_fx_table().currencies
+    with st.form(key="recurring_form"):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            st.text_input("Name:", key="recurring_name", placeholder="e.g. Rent, Netflix")
+            st.selectbox("Category:", EXPENSE_CATEGORIES, key="recurring_category")
+        with col2:
+            st.number_input("Amount:", min_value=0.0, key="recurring_amount")
+            st.selectbox(
+                "Currency:",
+                currencies,
+                index=currencies.index(st.session_state.display_currency),
+                key="recurring_currency"
+            )
+        with col3:
+            st.selectbox("Repeats:", FREQUENCIES, index=2, key="recurring_frequency")
+            st.number_input("Every:", min_value=1, value=1, step=1, key="recurring_interval")
+        st.date_input("Starting:", key="recurring_start")
+        st.form_submit_button("Add Recurring Expense", on_click=add_recurring_rule)
+    
+    for index, rule in enumerate(st.session_state.recurring):
+        col1, col2 = st.columns([5, 1])
+        col1.write(f"🔁 {rule.describe()}")
+        col2.button("Remove", key=f"remove_recurring_{index}", on_click=remove_recurring_rule, args=(index,))
 
 # --- Generate budget recommendation based on income ---
+@st.cache_data
 def generate_budget_recommendation(income):
     # 50/30/20 rule
     needs = income * 0.5
@@ -242,6 +533,228 @@ def generate_budget_recommendation(income):
         }
     }
 
+# --- Expense Form ---
+def close_expense_form():
+    st.session_state.show_expense_form = False
+
+@in_session
+def import_bulk_expenses():
+    imported, anomalies, skipped = 0, 0, []
+    for number, line, parsed in parse_bulk(st.session_state.bulk_expenses.splitlines()):
+        if parsed is None or not parsed.ok:
+            skipped.append(number)
+            continue
+        for expense in parsed.expenses:
+            currency = expense.currency or st.session_state.display_currency
+            if record_expense(expense.category, expense.amount, expense.date, currency):
+                anomalies += 1
+            imported += 1
+    
+    response = f"✅ Imported {imported} expenses."
+    if anomalies:
+        response += f" ⚠️ {anomalies} of them look unusually high for their category."
+    if skipped:
+        response += f" I couldn't read line{'s' if len(skipped) > 1 else ''} {', '.join(map(str, skipped[:10]))}{'...' if len(skipped) > 10 else ''}."
+    st.session_state.chat_history.append(("Bulk import", response))
+    
+    st.session_state.bulk_expenses = ""
+    st.session_state.expense_added = True
+
+@st.fragment
+@in_session
+def expense_form_panel():
+    if not st.session_state.show_expense_form:
+        return
+    
+    st.divider()
+    st.subheader("Add an Expense")
+    with st.form(key="expense_form"):
+        st.selectbox(
+            "Category:", 
+            EXPENSE_CATEGORIES,
+            key="expense_category"
+        )
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.number_input("Amount:", min_value=0.0, key="expense_amount")
+        with col2:
+            currencies = get_fx_table().currencies
+            st.selectbox(
+                "Currency:",
+                currencies,
+                index=currencies.index(st.session_state.display_currency),
+                key="expense_currency"
+            )
+        st.form_submit_button("Add Expense", on_click=handle_expenses)
+    
+    with st.expander("📋 Bulk import"):
+        st.text_area(
+            "One expense per line:",
+            key="bulk_expenses",
+            placeholder="$42 groceries yesterday\n$1200 rent on 10/1\ncoffee 4.50, uber 12"
+        )
+        st.button("Import", on_click=import_bulk_expenses)
+    
+    # Rules are stored once and expanded only over the window a report asks for
+    with st.expander("🔁 Recurring expenses"):
+        recurring_expense_panel()
+    
+    st.button("Done", key="close_expense_form", on_click=close_expense_form)
+    
+    # A new expense changes the chat history and the sidebar budget, which live
+    # outside this fragment, so refresh the whole page once
+    if st.session_state.pop("expense_added", False):
+        st.rerun()
+
+# --- Expense Report ---
+def close_report():
+    st.session_state.show_report = False
+
+def set_display_currency():
+    st.session_state.display_currency = st.session_state.report_currency
+
+@st.fragment
+@in_session
+def report_panel():
+    recurring = st.session_state.recurring
+    if not st.session_state.show_report or (st.session_state.expenses.empty and not recurring):
+        return
+    
+    expenses = st.session_state.expenses
+    fx = get_fx_table()
+    # Recurring charges count once they fall due
+    today = pd.Timestamp.now().date()
+    
+    st.divider()
+    st.subheader("Your Expense Report")
+    
+    # Every figure below is converted with the same rate snapshot
+    # Copied out of the widget key so the choice survives while the report is closed
+    currency = st.session_state.display_currency
+    st.selectbox(
+        "Show amounts in:",
+        fx.currencies,
+        index=fx.currencies.index(currency),
+        key="report_currency",
+        on_change=set_display_currency
+    )
+    currency = st.session_state.report_currency
+    st.caption(f"Exchange rates as of {pd.Timestamp(fx.as_of, unit='s'):%b %d, %Y %H:%M} UTC ({fx.source})")
+    
+    # Summary metrics come from running totals, not a scan of the ledger
+    by_category = combined_category_totals(expenses, recurring, today, currency, fx)
+    total_spent = sum(by_category.values())
+    income = fx.convert(st.session_state.user_data["income"], BASE_CURRENCY, currency)
+    savings = income - total_spent if income > total_spent else 0
+    savings_percentage = (savings / income * 100) if income > 0 else 0
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Monthly Income", format_money(income, currency))
+    col2.metric("Total Expenses", format_money(total_spent, currency))
+    col3.metric("Savings", f"{format_money(savings, currency)} ({savings_percentage:.1f}%)")
+    
+    # Charts
+    st.subheader("Spending by Category")
+    st.bar_chart(
+        pd.DataFrame(sorted(by_category.items()), columns=["Category", "Amount"]),
+        x="Category", y="Amount"
+    )
+    
+    st.subheader("Spending Over Time")
+    st.line_chart(combined_chart_series(expenses, recurring, today, currency, fx))
+    
+    # Budget vs actual, read from the incrementally maintained tracker
+    st.subheader("Budget vs Actual (This Month)")
+    st.dataframe(
+        st.session_state.budget_tracker.status(scheduled=recurring_this_month()),
+        hide_index=True,
+        column_config={
+            "Budget": st.column_config.NumberColumn(format="$%.2f"),
+            "Spent": st.column_config.NumberColumn(format="$%.2f"),
+            "Remaining": st.column_config.NumberColumn(format="$%.2f"),
+            "Burn Rate/Day": st.column_config.NumberColumn(format="$%.2f"),
+            "Projected": st.column_config.NumberColumn(format="$%.2f"),
+            "Used %": st.column_config.NumberColumn(format="%.0f%%"),
+        }
+    )
+    
+    # Rollup tables
+    st.subheader("Rollups")
+    granularity = st.radio("Group by:", GRANULARITIES, index=2, horizontal=True, key="report_granularity")
+    st.dataframe(
+        merge_rollups(
+            expenses.rollup(granularity, currency=currency, fx=fx),
+            recurring.rollup(granularity, None, today, currency, fx),
+            limit=DEFAULT_PAGE_SIZE
+        ),
+        hide_index=True
+    )
+    
+    # Paged, filterable data table
+    st.subheader("Expense Details")
+    first_date, last_date = expenses.date_range()
+    if recurring:
+        first_date = min(d for d in (first_date, recurring.first_date()) if d is not None)
+        # A rule starting in the future must not push the range's start past its end
+        last_date = max(last_date or today, today, first_date)
+    col1, col2 = st.columns(2)
+    with col1:
+        categories = st.multiselect(
+            "Categories:",
+            sorted(set(expenses.categories()) | {rule.category for rule in recurring}),
+            key="report_categories"
+        )
+    with col2:
+        date_range = st.date_input(
+            "Date range:",
+            value=(first_date, last_date),
+            min_value=first_date,
+            max_value=last_date,
+            key="report_dates"
+        )
+    start, end = date_range if len(date_range) == 2 else (date_range[0], None)
+    
+    match_count = expenses.count(categories, start, end)
+    page_count = max(-(-match_count // DEFAULT_PAGE_SIZE), 1)
+    page = st.number_input("Page:", min_value=1, max_value=page_count, value=1, key="report_page")
+    rows, _ = expenses.page(page, DEFAULT_PAGE_SIZE, categories, start, end, currency, fx)
+    st.dataframe(rows)
+    st.caption(f"Showing page {page} of {page_count} ({match_count} matching expenses)")
+    
+    if recurring:
+        st.subheader("Recurring Expenses")
+        due = min(end or today, today)
+        summary = recurring.summary(start, due, currency, fx)
+        if categories:
+            summary = summary[summary["Category"].isin(categories)]
+        st.dataframe(summary, hide_index=True)
+        st.caption("Recurring charges are counted in the totals above without being added to the expense table.")
+    
+    st.button("Close Report", on_click=close_report)
+
+def new_budget_tracker():
+    return BudgetTracker.from_budget(
+        generate_budget_recommendation(st.session_state.user_data["income"])
+    )
+
+# --- Budget vs Actual ---
+def render_budget_tracker():
+    status = st.session_state.budget_tracker.status(scheduled=recurring_this_month())
+    budgeted = status[status["Budget"] > 0]
+    
+    st.subheader("Budget This Month")
+    for row in budgeted.itertuples():
+        used = min(row.Spent / row.Budget, 1.0)
+        if row.Remaining >= 0:
+            label = f"{row.Category}: ${row.Spent:.0f} of ${row.Budget:.0f} (${row.Remaining:.0f} left)"
+        else:
+            label = f"⚠️ {row.Category}: ${row.Spent:.0f} of ${row.Budget:.0f} (${-row.Remaining:.0f} over)"
+        st.progress(used, text=label)
+    
+    unbudgeted = status[status["Budget"] == 0]["Spent"].sum()
+    if unbudgeted > 0:
+        st.caption(f"Unbudgeted spending: ${unbudgeted:.2f}")
+
 # --- Welcome & Onboarding Page ---
 def onboarding_page():
     st.title("Welcome to FinanceBot! 💸")
@@ -272,45 +785,70 @@ def onboarding_page():
             st.number_input("Monthly income ($):", min_value=0.0, key="income_input")
             st.form_submit_button("Start My Financial Journey", on_click=submit_user_info)
 
+# --- Sidebar ---
+@st.fragment
+@in_session
+def sidebar_panel():
+    # Say so when answers are coming from saved snapshots rather than live services
+    unavailable = [name for name, breaker in get_upstreams().items() if not breaker.healthy]
+    if unavailable:
+        st.warning(f"⚠️ Limited mode: {', '.join(unavailable)} unavailable. Showing saved data where possible.")
+
+    st.subheader("Your Profile")
+    st.write(f"👤 Name: {st.session_state.user_data['name']}")
+    st.write(f"📧 Email: {st.session_state.user_data['email']}")
+    st.write(f"💵 Income: ${st.session_state.user_data['income']:.2f}/month")
+    
+    st.divider()
+    
+    if st.session_state.budget_tracker is not None:
+        render_budget_tracker()
+        st.divider()
+    
+    # Marketing consent - conditional logic requirement
+    if st.session_state.consent is None:
+        st.subheader("Quick Question")
+        st.write("Would you like to receive occasional financial tips via email?")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("Yes, please!", on_click=set_consent, args=(True,))
+        with col2:
+            st.button("No, thanks", on_click=set_consent, args=(False,))
+    
+    st.divider()
+    
+    # Help section
+    with st.expander("💡 What can I ask?"):
+        st.markdown("""
+        Try asking me:
+        - "Help me create a budget"
+        - "I want to track an expense"
+        - "What investment tips do you have?"
+        - "Show me my spending report"
+        - "How should I save for retirement?"
+        """)
+    
+    if st.button("End Session"):
+        st.session_state.convo_active = False
+        st.rerun()
+
 # --- Main Chat Interface ---
 def chat_page():
     st.title(f"FinanceBot Chat 💬")
     
-    # Sidebar with user info
+    # Each panel is a fragment, so interacting with one reruns only that panel
     with st.sidebar:
-        st.subheader("Your Profile")
-        st.write(f"👤 Name: {st.session_state.user_data['name']}")
-        st.write(f"📧 Email: {st.session_state.user_data['email']}")
-        st.write(f"💵 Income: ${st.session_state.user_data['income']:.2f}/month")
-        
-        st.divider()
-        
-        # Marketing consent - conditional logic requirement
-        if st.session_state.consent is None:
-            st.subheader("Quick Question")
-            st.write("Would you like to receive occasional financial tips via email?")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.button("Yes, please!", on_click=set_consent, args=(True,))
-            with col2:
-                st.button("No, thanks", on_click=set_consent, args=(False,))
-        
-        st.divider()
-        
-        # Help section
-        with st.expander("💡 What can I ask?"):
-            st.markdown("""
-            Try asking me:
-            - "Help me create a budget"
-            - "I want to track an expense"
-            - "What investment tips do you have?"
-            - "Show me my spending report"
-            - "How should I save for retirement?"
-            """)
-        
-        if st.button("End Session"):
-            st.session_state.convo_active = False
-            st.rerun()
+        sidebar_panel()
+    
+    chat_panel()
+
+@st.fragment
+@in_session
+def chat_panel():
+    # Ending the conversation switches pages, and a logged expense changes the
+    # sidebar budget; both need a full app rerun
+    if not st.session_state.convo_active or st.session_state.pop("expense_added", False):
+        st.rerun()
     
     # Main chat container
     chat_container = st.container()
@@ -383,60 +921,44 @@ def chat_page():
                 
                 # Expense Tracking Intent
                 elif "expense" in intent:
-                    st.subheader("Add an Expense")
-                    with st.form(key="expense_form"):
-                        st.selectbox(
-                            "Category:", 
-                            ["Housing", "Utilities", "Groceries", "Transportation", 
-                             "Entertainment", "Dining Out", "Shopping", "Other"],
-                            key="expense_category"
-                        )
-                        st.number_input("Amount ($):", min_value=0.0, key="expense_amount")
-                        st.form_submit_button("Add Expense", on_click=handle_expenses)
-                    
-                    st.write(f"Please fill out the form above to track your expense, {st.session_state.user_data['name']}.")
+                    # The form itself is rendered in its own panel below the chat
+                    st.session_state.show_expense_form = True
                     
+                    response = f"Please fill out the expense form below to track your expense, {st.session_state.user_data['name']}."
                     if len(st.session_state.expenses) > 0:
-                        st.write(f"You've tracked {len(st.session_state.expenses)} expenses so far.")
+                        response += f" You've tracked {len(st.session_state.expenses)} expenses so far."
+                    st.write(response)
                     
-                    if "current_message" not in st.session_state or not st.session_state.current_intent:
-                        st.session_state.chat_history.append((
-                            st.session_state.current_message, 
-                            "Please add your expense using the form above."
-                        ))
+                    st.session_state.chat_history.append((
+                        st.session_state.current_message, 
+                        response
+                    ))
                 
                 # Investment Tips Intent
-                # elif "investment" in intent:
-                #     try:
-                #         api_url = "htt"
-                #         btc_price = requests.get(api_url).json()["bitcoin"]["ethereum"]["usd"]
-                #         st.metric("Bitcoin Price", f"${btc_price}")
-                #         # st.metric("Ethereum Price", f"${eth_price}")
-
-                #     except:
-                #         st.warning("Could not fetch current Bitcoin price.")
+                elif "investment" in intent:
+                    currency = st.session_state.display_currency
+                    btc_price, age = get_btc_price(currency)
+                    if btc_price is None:
+                        st.warning("Could not fetch the current Bitcoin price.")
+                    elif age:
+                        st.metric("Bitcoin Price", format_money(btc_price, currency), help="Last known price")
+                        st.caption(f"⏱️ Last known price, fetched {describe_age(age)}. CoinGecko is unavailable right now.")
+                    else:
+                        st.metric("Bitcoin Price", format_money(btc_price, currency))
                     
-                #     name = st.session_state.user_data["name"]
-                #     income = st.session_state.user_data["income"]
-
-
-                # Investment Tips Intent
-                # Investment Tips Intent
-                    elif "investment" in intent:
-                        try:
-                            # Use environment variable instead of hardcoded URL
-                            coingecko_api_url = os.environ.get("COINGECKO_API_URL", "https://api.coingecko.com/api/v3/simple/price")
-                            api_params = "?ids=bitcoin&vs_currencies=usd"
-                            
-                            response = requests.get(f"{coingecko_api_url}{api_params}")
-                            btc_price = response.json()["bitcoin"]["usd"]  # Correct access path
-                            st.metric("Bitcoin Price", f"${btc_price}")
-                            
-                        except Exception as e:
-                            st.warning(f"Could not fetch current Bitcoin price: {str(e)}")
-                        
-                        name = st.session_state.user_data["name"]
-                        income = st.session_state.user_data["income"]
+                    # Price history per configured coin, downsampled to a few hundred points
+                    coins = chart_coins()
+                    for column, coin in zip(st.columns(len(coins)), coins):
+                        with column:
+                            history, fresh = get_price_history().series(coin, currency)
+                            if history.empty:
+                                st.caption(f"No {coin.title()} price history available yet.")
+                                continue
+                            st.caption(f"{coin.title()} in {currency}, last {HISTORY_DAYS} days" + ("" if fresh else " (cached)"))
+                            st.vega_lite_chart(history, chart_spec(currency))
+                    
+                    name = st.session_state.user_data["name"]
+                    income = st.session_state.user_data["income"]
                     
                     # Calculate recommended investment amount
                     monthly_investment = income * 0.15
@@ -445,7 +967,8 @@ def chat_page():
                     
                     investment_tips = get_ai_response(
                         f"Give {name} 3 specific investment tips based on a monthly income of ${income}, with a personal touch. Format as bullet points. Include one tip about long-term retirement planning.",
-                        "You are a certified financial advisor specializing in beginner investments. Be specific and personalized."
+                        "You are a certified financial advisor specializing in beginner investments. Be specific and personalized.",
+                        fallback=template_investment_tips(name, income, FINANCIAL_TIPS[2:5])
                     )
                     st.write(investment_tips)
                     
@@ -456,28 +979,19 @@ def chat_page():
                 
                 # View Report Intent
                 elif "report" in intent or "view" in intent:
-                    if not st.session_state.expenses.empty:
-                        st.subheader("Your Expense Report")
-                        
-                        # Summary metrics
-                        total_spent = st.session_state.expenses["Amount"].sum()
+                    if not st.session_state.expenses.empty or st.session_state.recurring:
+                        total_spent = sum(combined_category_totals(
+                            st.session_state.expenses, st.session_state.recurring,
+                            pd.Timestamp.now().date(), fx=get_fx_table()
+                        ).values())
                         income = st.session_state.user_data["income"]
                         savings = income - total_spent if income > total_spent else 0
                         savings_percentage = (savings / income * 100) if income > 0 else 0
                         
-                        col1, col2, col3 = st.columns(3)
-                        col1.metric("Monthly Income", f"${income:.2f}")
-                        col2.metric("Total Expenses", f"${total_spent:.2f}")
-                        col3.metric("Savings", f"${savings:.2f} ({savings_percentage:.1f}%)")
-                        
-                        # Chart
-                        st.subheader("Spending by Category")
-                        expense_by_category = st.session_state.expenses.groupby("Category").sum().reset_index()
-                        st.bar_chart(expense_by_category, x="Category", y="Amount")
-                        
-                        # Data table
-                        st.subheader("Expense Details")
-                        st.dataframe(st.session_state.expenses)
+                        # The report itself is rendered below the chat so paging and
+                        # filtering keep working across reruns
+                        st.session_state.show_report = True
+                        st.write("Your expense report is shown below the chat.")
                         
                         response = f"Here's your financial report, {st.session_state.user_data['name']}. You've spent ${total_spent:.2f} of your ${income:.2f} monthly income, saving ${savings:.2f} ({savings_percentage:.1f}% of income). Would you like any specific analysis of your spending habits?"
                     else:
@@ -530,7 +1044,20 @@ def chat_page():
                 
                 # End Conversation
                 elif "goodbye" in intent or "bye" in intent:
-                    message = f"Thank you for using FinanceBot, {st.session_state.user_data['name']}! I've sent a summary to {st.session_state.user_data['email']}. Feel free to come back anytime for more financial guidance. Have a wonderful day! 😊"
+                    # Rendering and sending happen on the job workers, not in this rerun
+                    summary = session_summary_payload(
+                        st.session_state.user_data,
+                        st.session_state.expenses,
+                        st.session_state.chat_history,
+                        st.session_state.budget_tracker.status(scheduled=recurring_this_month()) if st.session_state.budget_tracker else None,
+                        consent=st.session_state.consent,
+                        fx=get_fx_table(),
+                        recurring=st.session_state.recurring
+                    )
+                    if enqueue_job(SUMMARY_JOB, summary):
+                        message = f"Thank you for using FinanceBot, {st.session_state.user_data['name']}! I'm sending a summary to {st.session_state.user_data['email']}. Feel free to come back anytime for more financial guidance. Have a wonderful day! 😊"
+                    else:
+                        message = f"Thank you for using FinanceBot, {st.session_state.user_data['name']}! Feel free to come back anytime for more financial guidance. Have a wonderful day! 😊"
                     st.write(message)
                     
                     st.session_state.chat_history.append((
@@ -543,7 +1070,11 @@ def chat_page():
                     if st.button("Start New Session"):
                         # Reset specific parts but keep user data
                         st.session_state.chat_history = []
-                        st.session_state.expenses = pd.DataFrame(columns=["Category", "Amount", "Date"])
+                        st.session_state.expenses = ExpenseStore()
+                        st.session_state.show_report = False
+                        st.session_state.show_expense_form = False
+                        st.session_state.anomaly_detector = AnomalyDetector()
+                        st.session_state.budget_tracker = new_budget_tracker()
                         st.session_state.convo_active = True
                         st.rerun()
                 
@@ -570,17 +1101,46 @@ def chat_page():
                 # Clear current message
                 st.session_state.current_message = None
                 st.session_state.current_intent = None
+    
+    # Panels opened by an intent stay up across reruns until closed
+    expense_form_panel()
+    report_panel()
 
 # --- End Session Page ---
+def session_export(fmt):
+    """A deferred download: the archive is only built once the button is clicked.
+
+    The click is served outside any script run, so the session is restored
+    and pinned here in case it was spilled while the page sat idle.
+    """
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx else "local"
+    state = {"expenses": st.session_state.expenses, "chat_history": st.session_state.chat_history}
+    recurring = st.session_state.recurring
+    currency, fx = st.session_state.display_currency, get_fx_table()
+    today = pd.Timestamp.now().date()
+
+    def build():
+        with get_session_manager().using(session_id, state):
+            return spooled_export(
+                state["expenses"], state["chat_history"], fmt,
+                recurring=recurring, end=today, currency=currency, fx=fx
+            )
+    return build
+
 def end_session_page():
     st.title("Session Ended")
     st.write(f"Thank you for using FinanceBot, {st.session_state.user_data['name']}!")
     
     # Show expense summary if available
-    if not st.session_state.expenses.empty:
+    if not st.session_state.expenses.empty or st.session_state.recurring:
         st.subheader("Your Financial Summary")
         
-        total_spent = st.session_state.expenses["Amount"].sum()
+        by_category = combined_category_totals(
+            st.session_state.expenses, st.session_state.recurring,
+            pd.Timestamp.now().date(), fx=get_fx_table()
+        )
+        total_spent = sum(by_category.values())
         income = st.session_state.user_data["income"]
         
         col1, col2 = st.columns(2)
@@ -591,8 +1151,23 @@ def end_session_page():
             st.metric("Balance", f"${income - total_spent:.2f}")
         
         with col2:
-            expense_by_category = st.session_state.expenses.groupby("Category").sum()
-            st.bar_chart(expense_by_category)
+            st.bar_chart(
+                pd.DataFrame(sorted(by_category.items()), columns=["Category", "Amount"]),
+                x="Category", y="Amount"
+            )
+    
+    # Export - streamed from the store in chunks when the download starts
+    st.subheader("Export Your Data")
+    st.caption("Your expense ledger, daily/weekly/monthly rollups and chat transcript in one zip archive.")
+    export_format = st.radio("Format", export_formats(), horizontal=True, key="export_format", format_func=str.upper)
+    st.download_button(
+        "⬇️ Download my data",
+        data=session_export(export_format),
+        file_name=f"financebot_{pd.Timestamp.now():%Y%m%d}_{export_format}.zip",
+        mime=MIME_TYPES["zip"],
+        on_click="ignore",
+        key="export_download"
+    )
     
     st.markdown("""
     ### Financial Tips to Remember
@@ -606,7 +1181,11 @@ def end_session_page():
     if st.button("Start New Session", key="new_session"):
         # Reset session state
         st.session_state.chat_history = []
-        st.session_state.expenses = pd.DataFrame(columns=["Category", "Amount", "Date"])
+        st.session_state.expenses = ExpenseStore()
+        st.session_state.show_report = False
+        st.session_state.show_expense_form = False
+        st.session_state.anomaly_detector = AnomalyDetector()
+        st.session_state.budget_tracker = new_budget_tracker()
         st.session_state.convo_active = True
         st.rerun()
     
@@ -617,12 +1196,14 @@ def end_session_page():
 
 # --- Main app ---
 def main():
-    if not st.session_state.user_data["name"]:
-        onboarding_page()
-    elif st.session_state.convo_active:
-        chat_page()
-    else:
-        end_session_page()
+    # A spilled session is restored before any page reads its ledger or chat
+    with session_scope():
+        if not st.session_state.user_data["name"]:
+            onboarding_page()
+        elif st.session_state.convo_active:
+            chat_page()
+        else:
+            end_session_page()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+import calendar
+import datetime as dt
+from collections import defaultdict
+
+import pandas as pd
+
+from expense_store import memoized, to_date
+
+
+# Budget groups whose categories are spent rather than set aside
+SPENDING_GROUPS = ("Needs", "Wants")
+
+
+def spending_allowances(budget):
+    """Flatten a generate_budget_recommendation() result into category -> allowance."""
+    allowances = {}
+    for group in SPENDING_GROUPS:
+        allowances.update(budget.get(group, {}))
+    return allowances
+
+
+class BudgetTracker:
+    """Budget-vs-actual totals kept current as each expense is recorded.
+
+    Spending is accumulated per (month, category) on insert, so the live view
+    only ever reads a handful of running sums instead of the ledger.
+    """
+
+    def __init__(self, allowances):
+        self.allowances = dict(allowances)
+        self._spent = defaultdict(lambda: defaultdict(float))
+        self.version = 0
+        self._memo = {}
+        self._memo_version = 0
+
+    @classmethod
+    def from_budget(cls, budget):
+        return cls(spending_allowances(budget))
+
+    def add(self, category, amount, date=None):
+        date = to_date(date)
+        self._spent[date.strftime("%Y-%m")][category] += float(amount)
+        self.version += 1
+
+    def spent(self, category, month=None):
+        month = month or dt.date.today().strftime("%Y-%m")
+        return self._spent.get(month, {}).get(category, 0.0)
+
+    def status(self, today=None, scheduled=None):
+        """Per-category allowance, spend, remaining and burn rate for the month of today.
+
+        `scheduled` maps category -> recurring spend so far this month, which
+        is counted alongside logged expenses without being recorded here.
+        """
+        return self._status(to_date(today), tuple(sorted((scheduled or {}).items())))
+
+    @memoized
+    def _status(self, today, scheduled):
+        month = today.strftime("%Y-%m")
+        days_elapsed = today.day
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        spent = dict(self._spent.get(month, {}))
+        for category, amount in scheduled:
+            spent[category] = spent.get(category, 0.0) + amount
+
+        rows = []
+        categories = list(self.allowances) + sorted(c for c in spent if c not in self.allowances)
+        for category in categories:
+            allowance = self.allowances.get(category, 0.0)
+            amount = spent.get(category, 0.0)
+            burn_rate = amount / days_elapsed
+            rows.append({
+                "Category": category,
+                "Budget": allowance,
+                "Spent": amount,
+                "Remaining": allowance - amount,
+                "Burn Rate/Day": burn_rate,
+                "Projected": burn_rate * days_in_month,
+                "Used %": (amount / allowance * 100) if allowance > 0 else None,
+            })
+        return pd.DataFrame(rows, columns=[
+            "Category", "Budget", "Spent", "Remaining", "Burn Rate/Day", "Projected", "Used %"
+        ])
+
+    def over_budget(self, today=None, scheduled=None):
+        """Categories whose month-to-date spend already exceeds their allowance."""
+        status = self.status(today, scheduled)
+        return status[(status["Budget"] > 0) & (status["Remaining"] < 0)]["Category"].tolist()
@@ -0,0 +1,212 @@
+"""Record and replay HTTP traffic to the model and market-data services.
+
+With FINANCEBOT_CASSETTES=record every request the app makes through the
+OpenAI client or the shared requests session is sent as usual and its
+response written to a cassette file. With FINANCEBOT_CASSETTES=replay the
+same requests are answered from those files without touching the network,
+so whole conversations re-run offline and deterministically.
+
+Cassettes are keyed by the normalized request: method, path, sorted query
+and canonical JSON body. Hosts and auth headers are left out, so a
+recording replays against any endpoint and with any token.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+
+MODES = ("off", "record", "replay", "auto")
+# Only these response headers are replayed; bodies are stored decoded
+KEPT_HEADERS = ("content-type",)
+
+
+class CassetteMissError(requests.ConnectionError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def _canonical_body(body):
+    if not body:
+        return ""
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return hashlib.sha256(body).hexdigest()
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+def normalize_request(method, url, body=None):
+    """The parts of a request that identify it, independent of host and headers."""
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip("/") or "/"
+    return f"{method.upper()} {path}{'?' + query if query else ''}", _canonical_body(body)
+
+
+class Cassette:
+    """A directory of recorded responses, one JSON file per normalized request.
+
+    `latency` controls replay timing: None answers immediately, "recorded"
+    waits as long as the original call took, and a number waits that many
+    seconds on every call.
+    """
+
+    def __init__(self, directory=None, mode="replay", latency=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.directory = directory or os.path.join(DATA_DIR, "cassettes")
+        self.mode = mode
+        self.latency = latency
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """The cassette configured by FINANCEBOT_CASSETTES, or None when off."""
+        mode = os.environ.get("FINANCEBOT_CASSETTES", "off").lower()
+        if mode == "off":
+            return None
+        latency = os.environ.get("FINANCEBOT_CASSETTE_LATENCY") or None
+        if latency not in (None, "recorded"):
+            latency = float(latency)
+        return cls(os.environ.get("FINANCEBOT_CASSETTE_DIR"), mode, latency)
+
+    @property
+    def replaying(self):
+        return self.mode in ("replay", "auto")
+
+    def _path(self, method, url, body):
+        line, canonical = normalize_request(method, url, body)
+        digest = hashlib.sha256(f"{line}\n{canonical}".encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.json"), line
+
+    def lookup(self, method, url, body=None):
+        """Return the recorded entry for a request, sleeping per `latency`, or None."""
+        path, line = self._path(method, url, body)
+        if not os.path.exists(path):
+            self.misses += 1
+            logger.warning("No cassette for %s", line)
+            if self.mode == "replay":
+                raise CassetteMissError(f"No recording for {line}")
+            return None
+        with open(path) as f:
+            entry = json.load(f)
+        self.hits += 1
+        delay = entry["latency"] if self.latency == "recorded" else self.latency
+        if delay:
+            time.sleep(delay)
+        return entry
+
+    def save(self, method, url, body, status, headers, content, latency):
+        path, line = self._path(method, url, body)
+        try:
+            text, encoded = content.decode("utf-8"), None
+        except UnicodeDecodeError:
+            text, encoded = None, base64.b64encode(content).decode("ascii")
+        entry = {
+            "request": line,
+            "status": status,
+            "headers": {k.lower(): v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            "body": text,
+            "body_b64": encoded,
+            "latency": latency,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=1)
+        os.replace(tmp_path, path)
+        self.recorded += 1
+
+    def stats(self):
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def _content(entry):
+    if entry["body_b64"] is not None:
+        return base64.b64decode(entry["body_b64"])
+    return entry["body"].encode("utf-8")
+
+
+# --- requests (CoinGecko, exchange rates) ---
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(request.method, request.url, request.body)
+            if entry is not None:
+                response = requests.Response()
+                response.status_code = entry["status"]
+                response.headers.update(entry["headers"])
+                response._content = _content(entry)
+                response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+                response.url = request.url
+                response.request = request
+                response.connection = self
+                return response
+
+        started = time.monotonic()
+        response = super().send(request, **kwargs)
+        self.cassette.save(request.method, request.url, request.body, response.status_code,
+                           response.headers, response.content, time.monotonic() - started)
+        return response
+
+
+def requests_session(cassette=None):
+    """A requests session that goes through `cassette` when one is given."""
+    session = requests.Session()
+    if cassette is not None:
+        adapter = CassetteAdapter(cassette)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+# --- httpx (OpenAI client) ---
+def httpx_client(cassette, timeout=None):
+    """An httpx client for OpenAI(http_client=...) that goes through `cassette`."""
+    class CassetteTransport(httpx.BaseTransport):
+        def __init__(self):
+            self.inner = httpx.HTTPTransport()
+
+        def handle_request(self, request):
+            body = request.read()
+            if cassette.replaying:
+                entry = cassette.lookup(request.method, request.url, body)
+                if entry is not None:
+                    return httpx.Response(entry["status"], headers=entry["headers"],
+                                          content=_content(entry), request=request)
+
+            started = time.monotonic()
+            response = self.inner.handle_request(request)
+            content = response.read()
+            cassette.save(request.method, request.url, body, response.status_code,
+                          response.headers, content, time.monotonic() - started)
+            # The body is already decoded, so drop encoding and length headers
+            headers = [(k, v) for k, v in response.headers.items()
+                       if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+            return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+        def close(self):
+            self.inner.close()
+
+    return httpx.Client(transport=CassetteTransport(), timeout=timeout)
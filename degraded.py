@@ -0,0 +1,186 @@
+"""Health tracking and last-known-good snapshots for upstream services.
+
+A CircuitBreaker per upstream (the models endpoint, CoinGecko) counts
+failures and slow calls. Once an upstream looks unhealthy, calls fail
+immediately for a cool-down period instead of each page waiting out a
+timeout, then a single probe call decides whether to close the circuit.
+
+While a circuit is open the app serves from a SnapshotStore: the last
+price fetched, intent labels and model answers saved from earlier
+successful calls, and local templates when nothing was saved. The same
+store serves recent values to every worker process while upstreams are
+healthy, so repeated calls are skipped.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from shared_cache import SharedCache, TieredCache
+
+
+# Consecutive failures before a circuit opens, and how long it stays open
+FAILURE_THRESHOLD = 3
+RESET_AFTER = float(os.environ.get("UPSTREAM_RESET_SECONDS", 30))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_after=RESET_AFTER,
+                 slow_call=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        # Calls slower than this many seconds count as failures
+        self.slow_call = slow_call
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return self.state == self.CLOSED
+
+    def allow(self):
+        """Whether a call may go out now. After the cool-down, admits one probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self, latency=None):
+        if self.slow_call is not None and latency is not None and latency > self.slow_call:
+            self.record_failure(f"slow response ({latency:.1f}s)")
+            return
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    def call(self, func, *args, **kwargs):
+        """Call func through the breaker, raising CircuitOpenError if it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable")
+        started = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(self.clock() - started)
+        return result
+
+    def status(self):
+        return {"name": self.name, "state": self.state, "failures": self.failures, "last_error": self.last_error}
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _digest(*parts):
+    return hashlib.sha1("\x00".join(parts).encode()).hexdigest()
+
+
+# How long a cached value is served instead of calling the upstream again
+PRICE_TTL = float(os.environ.get("PRICE_CACHE_SECONDS", 60))
+ANSWER_TTL = float(os.environ.get("ANSWER_CACHE_SECONDS", 3600))
+
+
+class SnapshotStore:
+    """Recent and last-known-good upstream values, shared by every process.
+
+    Prices, intent labels and model answers live in the host-wide
+    SharedCache, each namespace behind an in-process LRU. While fresh
+    (within PRICE_TTL / ANSWER_TTL) they are served instead of calling the
+    upstream again; during an outage any age is served, with its age.
+    Intent labels never go stale.
+    """
+
+    def __init__(self, cache=None):
+        cache = cache or SharedCache()
+        self.prices = TieredCache(cache, "prices", ttl=PRICE_TTL)
+        self.intents = TieredCache(cache, "intents")
+        self.answers = TieredCache(cache, "answers", ttl=ANSWER_TTL)
+
+    # --- Prices ---
+    def save_price(self, coin, currency, price):
+        self.prices.set(f"{coin}:{currency.lower()}", price)
+
+    def fresh_price(self, coin, currency):
+        """The price fetched within PRICE_TTL by any process, or None."""
+        return self.prices.get(f"{coin}:{currency.lower()}")
+
+    def last_price(self, coin, currency):
+        """Return (price, age in seconds) of the last fetched price, or None."""
+        return self.prices.get_stale(f"{coin}:{currency.lower()}")
+
+    # --- Intent labels ---
+    def save_intent(self, query, label):
+        self.intents.set(_normalize(query), label)
+
+    def intent(self, query):
+        return self.intents.get(_normalize(query))
+
+    # --- Model answers ---
+    def save_answer(self, system_instruction, prompt, answer):
+        self.answers.set(_digest(system_instruction, prompt), answer)
+
+    def fresh_answer(self, system_instruction, prompt):
+        """The answer to this exact prompt saved within ANSWER_TTL, or None."""
+        return self.answers.get(_digest(system_instruction, prompt))
+
+    def answer(self, system_instruction, prompt):
+        """Return (answer, age in seconds) saved for this exact prompt, or None."""
+        return self.answers.get_stale(_digest(system_instruction, prompt))
+
+
+def describe_age(seconds):
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h ago"
+    days = int(seconds // 86400)
+    return f"{days} day{'s' if days != 1 else ''} ago"
+
+
+# --- Templates for when nothing was saved ---
+def template_investment_tips(name, income, tips):
+    """Investment tips built locally from the standing tip list."""
+    lines = [f"Here are a few dependable guidelines, {name}:"]
+    lines += [f"- {tip}" for tip in tips]
+    lines.append(
+        f"- With ${income:,.2f}/month, automating ${income * 0.15:,.2f} into a low-cost "
+        "index fund or retirement account is a solid default."
+    )
+    return "\n".join(lines)
+
+
+DEGRADED_REPLY = (
+    "I can't reach my advisor model right now, so I can't answer open-ended questions. "
+    "I can still build a budget, log expenses, show your report, answer questions about "
+    "your spending and share saved investment tips."
+)
@@ -0,0 +1,344 @@
+import datetime as dt
+import re
+
+
+EXPENSE_CATEGORIES = [
+    "Housing", "Utilities", "Groceries", "Transportation",
+    "Entertainment", "Dining Out", "Shopping", "Other"
+]
+
+CATEGORY_SYNONYMS = {
+    "Housing": [
+        "housing", "rent", "mortgage", "landlord", "hoa", "property tax", "home insurance",
+    ],
+    "Utilities": [
+        "utilities", "utility", "utility bill", "electric", "electricity", "electric bill", "power bill",
+        "water bill", "gas bill", "heating", "internet", "wifi", "wi-fi", "phone bill", "cell phone",
+        "trash", "sewer",
+    ],
+    "Groceries": [
+        "groceries", "grocery", "grocery store", "supermarket", "food shopping", "produce",
+    ],
+    "Transportation": [
+        "transportation", "transport", "gas", "gasoline", "fuel", "petrol", "uber", "lyft", "taxi",
+        "cab", "bus", "train", "subway", "metro", "parking", "toll", "tolls", "car repair",
+        "car insurance", "bike", "commute", "transit",
+    ],
+    "Entertainment": [
+        "entertainment", "movie", "movies", "cinema", "concert", "concerts", "tickets", "netflix",
+        "spotify", "hulu", "streaming", "video games", "games", "game", "museum",
+    ],
+    "Dining Out": [
+        "dining out", "dining", "eating out", "eat out", "ate out", "restaurant", "restaurants", "lunch", "dinner",
+        "breakfast", "brunch", "takeout", "take-out", "delivery", "doordash", "coffee", "cafe",
+        "pizza", "burger", "sushi", "drinks", "bar",
+    ],
+    "Shopping": [
+        "shopping", "clothes", "clothing", "shoes", "amazon", "electronics", "gift", "gifts",
+        "furniture", "makeup",
+    ],
+    "Other": [
+        "other", "misc", "miscellaneous",
+    ],
+}
+
+# Words that mark a message as logging spending rather than asking about it.
+# A category alone is not enough: "my rent is 1500" states a figure, it doesn't log one
+EXPENSE_CUES = re.compile(
+    r"\b(spent|paid|bought|cost|costs|charged|log|add|record|expense|on)\b",
+    re.IGNORECASE
+)
+# Wording that belongs to another intent even when an amount and a cue are present
+OTHER_INTENT = re.compile(
+    r"\b(budget|budgets|budgeting|invest|investing|investment|investments|plan|planning|report|reports|"
+    r"summary|breakdown|chart|how|should|help|advice|save|saving|savings|goal|afford|want|show|set)\b",
+    re.IGNORECASE
+)
+QUESTION = re.compile(
+    r"\?\s*$|^\s*(how|what|when|where|why|which|who|should|could|can|would|is|are|do|does|did)\b",
+    re.IGNORECASE
+)
+
+# Longest synonyms first so "gas bill" wins over "gas"
+_SYNONYM_TO_CATEGORY = {
+    synonym: category
+    for category, synonyms in CATEGORY_SYNONYMS.items()
+    for synonym in synonyms
+}
+_CATEGORY_PATTERN = re.compile(
+    r"\b(" + "|".join(
+        re.escape(s) for s in sorted(_SYNONYM_TO_CATEGORY, key=len, reverse=True)
+    ) + r")\b",
+    re.IGNORECASE
+)
+
+# Currency markers that may precede or follow an amount, mapped to ISO codes
+CURRENCY_MARKERS = {
+    "$": "USD", "usd": "USD", "dollars": "USD", "dollar": "USD", "bucks": "USD",
+    "€": "EUR", "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "£": "GBP", "gbp": "GBP", "pound": "GBP", "pounds": "GBP", "quid": "GBP",
+    "¥": "JPY", "jpy": "JPY", "yen": "JPY",
+    "₹": "INR", "inr": "INR", "rupee": "INR", "rupees": "INR", "rs": "INR",
+    "cad": "CAD", "aud": "AUD", "chf": "CHF", "mxn": "MXN", "pesos": "MXN",
+}
+_SYMBOLS = "".join(re.escape(m) for m in CURRENCY_MARKERS if not m.isalpha())
+_CODES = "|".join(sorted((m for m in CURRENCY_MARKERS if m.isalpha()), key=len, reverse=True))
+
+_AMOUNT_PATTERN = re.compile(
+    r"(?<![\w.:])(?:([" + _SYMBOLS + r"])\s?|(" + _CODES + r")\.?\s?)?"
+    r"(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?\s?(k\b)?"
+    r"(?:\s?(" + _CODES + r")\b)?",
+    re.IGNORECASE
+)
+# What follows a number that is a count, time or ordinal rather than money
+_NOT_MONEY = re.compile(
+    r"\s?(?:(?:st|nd|rd|th|am|pm|o'?clock|x)\b|a\.m\.|p\.m\.|:\d|%)"
+    r"|\s*(?:people|persons?|friends?|guests?|others|kids|children|adults|times|minutes?|mins?|hours?|hrs?"
+    r"|days?|nights?|weeks?|months?|years?|yrs?|miles?|km|kilometers?|items?|pieces?|pcs|slices?|tickets?"
+    r"|bottles?|cups?|rounds?)\b",
+    re.IGNORECASE
+)
+
+_MONTHS = {
+    name: i
+    for i, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ], 1)
+    for name in names
+}
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_MONTH_NAMES = "|".join(sorted(_MONTHS, key=len, reverse=True))
+
+_DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")),
+    ("slash", re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b")),
+    ("month_day", re.compile(r"\b(" + _MONTH_NAMES + r")\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b", re.IGNORECASE)),
+    ("day_month", re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(" + _MONTH_NAMES + r")\b(?:,?\s+(\d{4}))?", re.IGNORECASE)),
+    ("ago", re.compile(r"\b(\d+|a|an|one|two|three|four|five|six|seven)\s+(day|days|week|weeks)\s+ago\b", re.IGNORECASE)),
+    ("weekday", re.compile(r"\b(?:(last|this|on)\s+)?(" + "|".join(_WEEKDAYS) + r")\b", re.IGNORECASE)),
+    ("relative", re.compile(r"\b(today|tonight|this morning|this afternoon|yesterday|day before yesterday)\b", re.IGNORECASE)),
+]
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+
+_SEGMENT_SPLIT = re.compile(r"[;\n]|,(?!\d{3})|\band\b|\bplus\b|\balso\b", re.IGNORECASE)
+
+
+class ParsedExpense:
+    def __init__(self, category, amount, date, currency=None):
+        self.category = category
+        self.amount = amount
+        self.date = date
+        # None when the message named no currency; the caller picks a default
+        self.currency = currency
+
+    def __repr__(self):
+        return f"ParsedExpense({self.category!r}, {self.amount!r}, {self.date.isoformat()!r}, {self.currency!r})"
+
+
+class ParseResult:
+    """Outcome of parsing one message.
+
+    `expenses` holds everything that was understood. `ambiguous` is set when
+    the message clearly logs spending but some part of it could not be
+    resolved, in which case the caller should fall back to the form.
+    """
+
+    def __init__(self, expenses=None, ambiguous=False, reason=None, amount_hint=None):
+        self.expenses = expenses or []
+        self.ambiguous = ambiguous
+        self.reason = reason
+        self.amount_hint = amount_hint
+
+    @property
+    def ok(self):
+        return bool(self.expenses) and not self.ambiguous
+
+
+def find_categories(text):
+    """Categories mentioned in text, in order of first mention."""
+    found = []
+    for match in _CATEGORY_PATTERN.finditer(text):
+        category = _SYNONYM_TO_CATEGORY[match.group(1).lower()]
+        if category not in found:
+            found.append(category)
+    return found
+
+
+# --- Dates ---
+def _make_date(year, month, day, today):
+    try:
+        date = dt.date(year, month, day)
+    except ValueError:
+        return None
+    # A bare "March 3" in January means last year's March
+    if date > today and year == today.year:
+        try:
+            date = date.replace(year=year - 1)
+        except ValueError:
+            return None
+    return date
+
+
+def _match_date(kind, match, today):
+    if kind == "iso":
+        return _make_date(int(match.group(1)), int(match.group(2)), int(match.group(3)), today)
+    if kind == "slash":
+        year = match.group(3)
+        year = today.year if year is None else int(year) + (2000 if len(year) == 2 else 0)
+        return _make_date(year, int(match.group(1)), int(match.group(2)), today)
+    if kind == "month_day":
+        year = int(match.group(3)) if match.group(3) else today.year
+        return _make_date(year, _MONTHS[match.group(1).lower()], int(match.group(2)), today)
+    if kind == "day_month":
+        year = int(match.group(3)) if match.group(3) else today.year
+        return _make_date(year, _MONTHS[match.group(2).lower()], int(match.group(1)), today)
+    if kind == "ago":
+        count = match.group(1).lower()
+        count = _NUMBER_WORDS.get(count) or int(count)
+        days = count * (7 if match.group(2).lower().startswith("week") else 1)
+        return today - dt.timedelta(days=days)
+    if kind == "weekday":
+        target = _WEEKDAYS.index(match.group(2).lower())
+        back = (today.weekday() - target) % 7
+        if back == 0 and (match.group(1) or "").lower() == "last":
+            back = 7
+        return today - dt.timedelta(days=back)
+    if kind == "relative":
+        word = match.group(1).lower()
+        if word == "yesterday":
+            return today - dt.timedelta(days=1)
+        if word == "day before yesterday":
+            return today - dt.timedelta(days=2)
+        return today
+    return None
+
+
+def extract_dates(text, today):
+    """Return (text with dates blanked out, [(start, end, date)])."""
+    found = []
+    chars = list(text)
+    for kind, pattern in _DATE_PATTERNS:
+        for match in pattern.finditer("".join(chars)):
+            date = _match_date(kind, match, today)
+            if date is None:
+                continue
+            found.append((match.start(), match.end(), date))
+            # Blank the span so its digits are not read as amounts
+            chars[match.start():match.end()] = " " * (match.end() - match.start())
+    return "".join(chars), found
+
+
+# --- Amounts and categories ---
+def _parse_amount(match):
+    whole, cents, thousands = match.group(3), match.group(4), match.group(5)
+    value = float(whole.replace(",", "") + (cents or ""))
+    if thousands:
+        value *= 1000
+    return value
+
+
+def _is_money(match, text):
+    """Whether an amount match is money rather than "2 friends", "5pm" or "the 15th"."""
+    if _parse_currency(match):
+        return True
+    return not _NOT_MONEY.match(text, match.end())
+
+
+def _parse_currency(match):
+    marker = match.group(1) or match.group(2) or match.group(6)
+    return CURRENCY_MARKERS[marker.lower()] if marker else None
+
+
+def _segments(text):
+    start = 0
+    for match in _SEGMENT_SPLIT.finditer(text):
+        yield start, match.start()
+        start = match.end()
+    yield start, len(text)
+
+
+def parse_expense_message(text, today=None, require_cue=True):
+    """Parse a chat message that logs one or more expenses.
+
+    Returns None when the message does not look like an expense log at all,
+    so the caller can route it elsewhere. Chat messages need a spending cue
+    and no wording of another intent; with require_cue=False, for text known
+    to be expenses, naming a category is enough.
+    """
+    if not text:
+        return None
+    if require_cue and (QUESTION.search(text) or OTHER_INTENT.search(text)):
+        return None
+    today = today or dt.date.today()
+
+    stripped, dates = extract_dates(text, today)
+    amounts = [(m.start(), m.end(), _parse_amount(m), _parse_currency(m))
+               for m in _AMOUNT_PATTERN.finditer(stripped) if _is_money(m, stripped)]
+    amounts = [a for a in amounts if a[2] > 0]
+    if not amounts:
+        return None
+    categories = [(m.start(), m.end(), _SYNONYM_TO_CATEGORY[m.group(1).lower()])
+                  for m in _CATEGORY_PATTERN.finditer(stripped)]
+    if not EXPENSE_CUES.search(stripped) and (require_cue or not categories):
+        return None
+
+    # A date applies to its own segment, or to the ones after a lead-in like "Yesterday,"
+    lead_date = None
+    undated = False
+    expenses, orphans = [], []
+    for seg_start, seg_end in _segments(stripped):
+        seg_amounts = [a for a in amounts if seg_start <= a[0] < seg_end]
+        seg_dates = [d for d in dates if seg_start <= d[0] < seg_end]
+        if not seg_amounts:
+            if seg_dates:
+                lead_date = seg_dates[0][2]
+            continue
+        if sum(a[3] is None for a in seg_amounts) > 1:
+            # "40 on lunch for 3" - only one of the bare numbers can be the amount
+            return ParseResult(
+                expenses, ambiguous=True,
+                reason="I found more than one number and wasn't sure which is the amount.",
+                amount_hint=seg_amounts[0][2]
+            )
+        seg_categories = [c for c in categories if seg_start <= c[0] < seg_end]
+        if seg_dates:
+            date = seg_dates[0][2]
+        elif lead_date is not None:
+            date = lead_date
+        else:
+            date, undated = today, True
+        for a_start, a_end, amount, currency in seg_amounts:
+            if not seg_categories:
+                orphans.append((amount, date, currency))
+                continue
+            # Pair each amount with the closest category mention in its segment
+            nearest = min(seg_categories, key=lambda c: min(abs(c[0] - a_end), abs(a_start - c[1])))
+            expenses.append(ParsedExpense(nearest[2], amount, date, currency))
+
+    if orphans:
+        distinct = {c[2] for c in categories}
+        if len(distinct) == 1 and not expenses:
+            category = distinct.pop()
+            expenses += [ParsedExpense(category, amount, date, currency) for amount, date, currency in orphans]
+        else:
+            return ParseResult(
+                expenses, ambiguous=True,
+                reason="I couldn't tell which category some amounts belong to.",
+                amount_hint=orphans[0][0]
+            )
+
+    if len(dates) > 1 and undated:
+        return ParseResult(expenses, ambiguous=True, reason="I found more than one date and wasn't sure which applies.")
+
+    return ParseResult(expenses)
+
+
+def parse_bulk(lines, today=None):
+    """Parse many lines, yielding (line_number, line, ParseResult or None)."""
+    today = today or dt.date.today()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            yield number, line, parse_expense_message(line, today, require_cue=False)
@@ -0,0 +1,347 @@
+import bisect
+import datetime as dt
+import functools
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from fx import BASE_CURRENCY
+
+
+COLUMNS = ["Category", "Amount", "Currency", "Date"]
+GRANULARITIES = ("daily", "weekly", "monthly")
+
+# Upper bound on the number of points handed to a chart in one rerun
+MAX_CHART_POINTS = 365
+DEFAULT_PAGE_SIZE = 50
+
+
+def to_date(value):
+    """Coerce a date, timestamp or 'YYYY-MM-DD' string to a datetime.date."""
+    if value is None:
+        return dt.date.today()
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    if isinstance(value, pd.Timestamp):
+        return value.date()
+    return dt.date.fromisoformat(str(value)[:10])
+
+
+def memoized(method):
+    """Cache a method's result until the owning object's version changes.
+
+    Streamlit reruns the whole report on every interaction, so derived views
+    are only rebuilt after the underlying data has actually been mutated.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._memo_version != self.version:
+            self._memo = {}
+            self._memo_version = self.version
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = method(self, *args, **kwargs)
+            return value
+    return wrapper
+
+
+def bucket_key(date, granularity):
+    """Return the rollup bucket label a date falls into."""
+    if granularity == "daily":
+        return date.isoformat()
+    if granularity == "weekly":
+        # Weeks are labelled by their Monday
+        return (date - dt.timedelta(days=date.weekday())).isoformat()
+    if granularity == "monthly":
+        return date.strftime("%Y-%m")
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+class ExpenseStore:
+    """Append-only expense ledger with rollups maintained on every insert.
+
+    Rows are kept column-wise in plain lists so an insert is O(1), and the
+    daily/weekly/monthly totals are updated in place instead of being
+    recomputed from the full ledger on each rerun.
+
+    Amounts are stored in the currency they were logged in and every running
+    total is kept per currency. Aggregates take a display `currency` and an
+    FX table, and are converted with one rate per currency present; without
+    an FX table all amounts are taken to be in the same currency.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._categories = []
+        self._amounts = []
+        self._currencies = []
+        self._dates = []
+        self._by_category = defaultdict(list)
+        # Date index: distinct days in order, and the rows logged on each
+        self._days = []
+        self._rows_by_day = defaultdict(list)
+        self._category_totals = defaultdict(float)
+        self._currency_totals = defaultdict(float)
+        self._rollups = {g: defaultdict(lambda: [0.0, 0]) for g in GRANULARITIES}
+        self._first_date = None
+        self._last_date = None
+        # Bumped on every mutation so derived views can be memoized
+        self.version = 0
+        self._memo = {}
+        self._memo_version = 0
+
+    def __len__(self):
+        return len(self._amounts)
+
+    @property
+    def empty(self):
+        return not self._amounts
+
+    def add(self, category, amount, date=None, currency=BASE_CURRENCY):
+        """Append one expense and fold it into the running rollups."""
+        amount = float(amount)
+        date = to_date(date)
+        row = len(self._amounts)
+
+        self._categories.append(category)
+        self._amounts.append(amount)
+        self._currencies.append(currency)
+        self._dates.append(date)
+        self._by_category[category].append(row)
+        if date not in self._rows_by_day:
+            bisect.insort(self._days, date)
+        self._rows_by_day[date].append(row)
+        self._category_totals[(category, currency)] += amount
+        self._currency_totals[currency] += amount
+        if self._first_date is None or date < self._first_date:
+            self._first_date = date
+        if self._last_date is None or date > self._last_date:
+            self._last_date = date
+
+        for granularity, table in self._rollups.items():
+            cell = table[(bucket_key(date, granularity), category, currency)]
+            cell[0] += amount
+            cell[1] += 1
+
+        self.version += 1
+        return row
+
+    def extend(self, rows):
+        """Append many (category, amount, date[, currency]) rows."""
+        for row in rows:
+            self.add(*row)
+
+    # --- Currency conversion ---
+    def currencies(self):
+        return sorted(self._currency_totals)
+
+    def _factors(self, currency, fx):
+        """Conversion multiplier for each currency present in the ledger."""
+        if fx is None:
+            return defaultdict(lambda: 1.0)
+        return {c: fx.factor(c, currency) for c in self._currency_totals}
+
+    # --- Aggregates ---
+    @memoized
+    def total(self, currency=BASE_CURRENCY, fx=None):
+        factors = self._factors(currency, fx)
+        return sum(amount * factors[c] for c, amount in self._currency_totals.items())
+
+    @memoized
+    def category_totals(self, currency=BASE_CURRENCY, fx=None):
+        factors = self._factors(currency, fx)
+        totals = defaultdict(float)
+        for (category, c), amount in self._category_totals.items():
+            totals[category] += amount * factors[c]
+        return dict(totals)
+
+    @memoized
+    def by_category(self, currency=BASE_CURRENCY, fx=None):
+        """Spending per category as a small frame suitable for a bar chart."""
+        return pd.DataFrame(
+            sorted(self.category_totals(currency, fx).items()),
+            columns=["Category", "Amount"]
+        )
+
+    @memoized
+    def rollup(self, granularity="monthly", limit=None, currency=BASE_CURRENCY, fx=None):
+        """Return the rollup table for a granularity, newest buckets first."""
+        factors = self._factors(currency, fx)
+        merged = defaultdict(lambda: [0.0, 0])
+        for (period, category, c), cell in self._rollups[granularity].items():
+            target = merged[(period, category)]
+            target[0] += cell[0] * factors[c]
+            target[1] += cell[1]
+        rows = sorted(
+            ((period, category, cell[0], cell[1]) for (period, category), cell in merged.items()),
+            key=lambda r: (r[0], r[1]),
+            reverse=True
+        )
+        if limit is not None:
+            rows = rows[:limit]
+        return pd.DataFrame(rows, columns=["Period", "Category", "Amount", "Count"])
+
+    @memoized
+    def period_totals(self, granularity, currency=BASE_CURRENCY, fx=None):
+        """Total spending per bucket, oldest first."""
+        factors = self._factors(currency, fx)
+        totals = defaultdict(float)
+        for (period, _, c), cell in self._rollups[granularity].items():
+            totals[period] += cell[0] * factors[c]
+        return sorted(totals.items())
+
+    @memoized
+    def chart_series(self, max_points=MAX_CHART_POINTS, currency=BASE_CURRENCY, fx=None):
+        """Spending over time, coarsened until it fits within max_points."""
+        for granularity in GRANULARITIES:
+            series = self.period_totals(granularity, currency, fx)
+            if len(series) <= max_points:
+                break
+        series = downsample_sums(series, max_points)
+        return pd.DataFrame(series, columns=["Period", "Amount"]).set_index("Period")
+
+    # --- Indexed range lookups ---
+    def days_between(self, start=None, end=None):
+        """Days with at least one expense in [start, end], found by bisection."""
+        lo = 0 if start is None else bisect.bisect_left(self._days, to_date(start))
+        hi = len(self._days) if end is None else bisect.bisect_right(self._days, to_date(end))
+        return self._days[lo:hi]
+
+    def totals_between(self, start=None, end=None, categories=None, currency=BASE_CURRENCY, fx=None):
+        """Return {category: (amount, count)} for [start, end] from the daily rollup."""
+        factors = self._factors(currency, fx)
+        if start is None and end is None and not categories:
+            amounts = self.category_totals(currency, fx)
+            return {c: (amounts[c], len(self._by_category[c])) for c in amounts}
+        daily = self._rollups["daily"]
+        wanted = categories or list(self._by_category)
+        present = list(self._currency_totals)
+        totals = {}
+        for day in self.days_between(start, end):
+            key = day.isoformat()
+            for category in wanted:
+                for c in present:
+                    cell = daily.get((key, category, c))
+                    if cell:
+                        amount, count = totals.get(category, (0.0, 0))
+                        totals[category] = (amount + cell[0] * factors[c], count + cell[1])
+        return totals
+
+    def rows_between(self, start=None, end=None, categories=None):
+        """Row ids logged in [start, end], optionally limited to some categories."""
+        rows_by_day = self._rows_by_day
+        rows = [r for day in self.days_between(start, end) for r in rows_by_day[day]]
+        if categories:
+            wanted = set(categories)
+            rows = [r for r in rows if self._categories[r] in wanted]
+        return rows
+
+    def row(self, index):
+        return self._categories[index], self._amounts[index], self._dates[index], self._currencies[index]
+
+    def amounts_for(self, rows, currency=BASE_CURRENCY, fx=None):
+        """Converted amounts of the given rows as a numpy array."""
+        amounts = [self._amounts[r] for r in rows]
+        if fx is None:
+            return np.asarray(amounts, dtype=float)
+        return fx.convert_array(amounts, [self._currencies[r] for r in rows], currency)
+
+    # --- Row access ---
+    def _matching_rows(self, categories=None, start=None, end=None):
+        # Normalized so paging through the same filter reuses one scan
+        categories = tuple(sorted(categories)) if categories else None
+        start = to_date(start) if start is not None else None
+        end = to_date(end) if end is not None else None
+        return self._filtered_rows(categories, start, end)
+
+    @memoized
+    def _filtered_rows(self, categories, start, end):
+        if categories:
+            rows = sorted(r for c in categories for r in self._by_category.get(c, ()))
+        else:
+            rows = range(len(self._amounts))
+        if start is None and end is None:
+            return list(rows)
+        dates = self._dates
+        return [
+            r for r in rows
+            if (start is None or dates[r] >= start) and (end is None or dates[r] <= end)
+        ]
+
+    def count(self, categories=None, start=None, end=None):
+        """Number of rows matching a filter."""
+        if not categories and start is None and end is None:
+            return len(self._amounts)
+        return len(self._matching_rows(categories, start, end))
+
+    def _frame(self, rows, currency, fx, index=None):
+        frame = pd.DataFrame({
+            "Category": [self._categories[r] for r in rows],
+            "Amount": [self._amounts[r] for r in rows],
+            "Currency": [self._currencies[r] for r in rows],
+            "Date": [self._dates[r].isoformat() for r in rows],
+        }, columns=COLUMNS, index=index)
+        if fx is not None:
+            frame[f"Amount ({currency})"] = fx.convert_array(frame["Amount"], frame["Currency"], currency)
+        return frame
+
+    def page(self, page=1, page_size=DEFAULT_PAGE_SIZE, categories=None, start=None, end=None,
+             currency=BASE_CURRENCY, fx=None):
+        """Return (frame, match_count) for one page of filtered rows, newest first."""
+        rows = self._matching_rows(categories, start, end)
+        match_count = len(rows)
+        stop = max(match_count - (page - 1) * page_size, 0)
+        begin = max(stop - page_size, 0)
+        selected = rows[begin:stop][::-1]
+        return self._frame(selected, currency, fx, pd.Index(selected, name="#")), match_count
+
+    def categories(self):
+        return sorted(self._by_category)
+
+    def date_range(self):
+        return self._first_date, self._last_date
+
+    def columns(self):
+        """The raw ledger columns: (categories, amounts, currencies, dates)."""
+        return self._categories, self._amounts, self._currencies, self._dates
+
+    def iter_frames(self, chunk_rows=50_000, currency=BASE_CURRENCY, fx=None):
+        """Yield the ledger in insertion order as frames of at most chunk_rows rows.
+
+        Only one chunk is materialized at a time, so exporting a large
+        ledger needs memory for a chunk rather than a full copy.
+        """
+        count = len(self._amounts)
+        for begin in range(0, max(count, 1), chunk_rows):
+            rows = range(begin, min(begin + chunk_rows, count))
+            yield self._frame(rows, currency, fx)
+
+    def to_frame(self, currency=BASE_CURRENCY, fx=None):
+        """Materialize the full ledger. Avoid on hot paths for large ledgers.
+
+        With an FX table, an extra column holds every amount converted to
+        `currency` in one vectorized pass.
+        """
+        return self._frame(range(len(self._amounts)), currency, fx)
+
+
+def downsample_sums(series, max_points):
+    """Merge adjacent (label, total) points so at most max_points remain.
+
+    Totals are summed so the overall amount charted is preserved; each merged
+    point keeps the label of the first bucket it covers.
+    """
+    if max_points <= 0 or len(series) <= max_points:
+        return list(series)
+    step = -(-len(series) // max_points)
+    return [
+        (series[i][0], sum(amount for _, amount in series[i:i + step]))
+        for i in range(0, len(series), step)
+    ]
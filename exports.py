@@ -0,0 +1,111 @@
+"""Export a session's ledger, rollups and chat transcript to CSV or Parquet.
+
+Everything is written in chunks straight from the ExpenseStore and chat
+history into one zip archive, so memory stays bounded by the chunk size
+however large the ledger is:
+
+    with open("financebot.zip", "wb") as f:
+        export_session(f, expenses, chat_history, fmt="parquet")
+
+Parquet needs pyarrow; CSV is always available.
+"""
+import os
+import tempfile
+import zipfile
+
+import pandas as pd
+
+from expense_store import GRANULARITIES
+from fx import BASE_CURRENCY
+from recurring import merge_rollups
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+CHUNK_ROWS = 50_000
+# Spooled exports move from memory to a temporary file beyond this size
+SPOOL_BYTES = 8 * 1024 * 1024
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet", "zip": "application/zip"}
+
+
+def formats():
+    """Export formats available in this environment."""
+    return ("csv", "parquet") if pq is not None else ("csv",)
+
+
+def transcript_frames(chat_history, chunk_rows=CHUNK_ROWS):
+    """Yield the chat history as frames of at most chunk_rows turns."""
+    for begin in range(0, max(len(chat_history), 1), chunk_rows):
+        turns = chat_history[begin:begin + chunk_rows]
+        yield pd.DataFrame(
+            [(begin + i + 1, str(user_msg), str(bot_msg)) for i, (user_msg, bot_msg) in enumerate(turns)],
+            columns=["Turn", "You", "FinanceBot"]
+        )
+
+
+# --- Writers ---
+def write_csv(frames, f):
+    """Write frames to a binary file as one CSV with a single header row."""
+    header = True
+    for frame in frames:
+        if frame.empty and not header:
+            continue
+        f.write(frame.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+
+
+def write_parquet(frames, f):
+    """Write frames to a binary file as one Parquet file, a row group per frame."""
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(f, table.schema)
+            elif frame.empty:
+                continue
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+def export_session(f, expenses, chat_history, fmt="csv", recurring=None, end=None,
+                   currency=BASE_CURRENCY, fx=None, chunk_rows=CHUNK_ROWS):
+    """Write ledger, per-granularity rollups and transcript into a zip archive.
+
+    Recurring rules, when given, are folded into the rollups up to end,
+    matching the report. Each member is streamed into the archive as it
+    is written, so no member is ever held whole in memory.
+    """
+    write = WRITERS[fmt]
+    with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f"ledger.{fmt}", "w", force_zip64=True) as member:
+            write(expenses.iter_frames(chunk_rows, currency, fx), member)
+
+        for granularity in GRANULARITIES:
+            rollup = expenses.rollup(granularity, currency=currency, fx=fx)
+            if recurring is not None and len(recurring):
+                rollup = merge_rollups(rollup, recurring.rollup(granularity, None, end, currency, fx))
+            with archive.open(f"rollup_{granularity}.{fmt}", "w") as member:
+                write([rollup.astype({"Period": str, "Category": str, "Amount": float, "Count": int})], member)
+
+        with archive.open(f"transcript.{fmt}", "w", force_zip64=True) as member:
+            write(transcript_frames(chat_history, chunk_rows), member)
+
+
+def spooled_export(*args, **kwargs):
+    """Run export_session into a spooled temporary file and return it rewound."""
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES, dir=os.environ.get("FINANCEBOT_EXPORT_DIR"))
+    export_session(f, *args, **kwargs)
+    f.seek(0)
+    return f
@@ -0,0 +1,76 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+
+# Shared by every session, so never counted against one
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes reachable from obj, counting each object once.
+
+    Follows containers, instance attributes and slots; pandas and numpy
+    objects report their own buffer sizes. Pass the same `seen` set across
+    calls to avoid counting shared objects twice.
+    """
+    seen = set() if seen is None else seen
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = item.memory_usage(deep=True)
+            total += int(usage.sum() if hasattr(usage, "sum") else usage)
+            continue
+        if isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (0 if item.base is not None else item.nbytes)
+            continue
+
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif not isinstance(item, (str, bytes, int, float, complex, bool)):
+            attrs = getattr(item, "__dict__", None)
+            if attrs is not None:
+                stack.append(attrs)
+            for slot in getattr(type(item), "__slots__", ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def session_footprint(state, keys):
+    """Bytes held by each of `keys` in a session state mapping, plus their total."""
+    seen = set()
+    sizes = {key: deep_sizeof(state[key], seen) if key in state else 0 for key in keys}
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+def resident_memory():
+    """Resident set size of this process in bytes, or None if unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from paths import data_path
+
+
+BASE_CURRENCY = "USD"
+# Refresh the cached table after this many seconds
+MAX_AGE = float(os.environ.get("FX_MAX_AGE", 12 * 3600))
+DEFAULT_FX_API_URL = "https://open.er-api.com/v6/latest/USD"
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fx_snapshot.json")
+
+CURRENCY_SYMBOLS = {
+    "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "INR": "₹", "CAD": "CA$",
+    "AUD": "A$", "CHF": "CHF ", "CNY": "CN¥", "MXN": "MX$", "BRL": "R$", "SGD": "S$",
+}
+# Currencies without minor units
+ZERO_DECIMAL = {"JPY", "KRW"}
+
+
+def format_money(amount, currency=BASE_CURRENCY):
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    decimals = 0 if currency in ZERO_DECIMAL else 2
+    if symbol is None:
+        return f"{amount:,.{decimals}f} {currency}"
+    return f"{symbol}{amount:,.{decimals}f}"
+
+
+class FXTable:
+    """Exchange rates quoted as units of each currency per one BASE_CURRENCY.
+
+    A table is immutable once built; refreshing produces a new table with a
+    new snapshot_id, so anything memoized against an old one is not reused.
+    """
+
+    def __init__(self, rates, as_of, source):
+        self.rates = {code.upper(): float(rate) for code, rate in rates.items()}
+        self.rates[BASE_CURRENCY] = 1.0
+        self.as_of = as_of
+        self.source = source
+        digest = hashlib.sha1(json.dumps(self.rates, sort_keys=True).encode()).hexdigest()[:12]
+        self.snapshot_id = f"{int(as_of)}-{digest}"
+
+    def __eq__(self, other):
+        return isinstance(other, FXTable) and other.snapshot_id == self.snapshot_id
+
+    def __hash__(self):
+        return hash(self.snapshot_id)
+
+    @property
+    def currencies(self):
+        return sorted(self.rates)
+
+    def factor(self, from_currency, to_currency):
+        """Multiplier taking an amount in from_currency to to_currency."""
+        if from_currency == to_currency:
+            return 1.0
+        try:
+            return self.rates[to_currency] / self.rates[from_currency]
+        except KeyError as e:
+            raise ValueError(f"No exchange rate for {e.args[0]}") from None
+
+    def convert(self, amount, from_currency, to_currency):
+        return amount * self.factor(from_currency, to_currency)
+
+    def convert_array(self, amounts, currencies, to_currency):
+        """Vectorized conversion of parallel amount/currency arrays."""
+        amounts = np.asarray(amounts, dtype=float)
+        codes, uniques = pd.factorize(np.asarray(currencies, dtype=object))
+        if not len(uniques):
+            return amounts
+        # One rate lookup per distinct currency, then a single gather and multiply
+        factors = np.array([self.factor(c, to_currency) for c in uniques], dtype=float)
+        return amounts * factors[codes]
+
+    def to_dict(self):
+        return {"base": BASE_CURRENCY, "as_of": self.as_of, "source": self.source, "rates": self.rates}
+
+
+def _table_from_payload(payload, source):
+    """Build a table from our cache format or a typical rates API response."""
+    rates = payload["rates"]
+    base = (payload.get("base") or payload.get("base_code") or BASE_CURRENCY).upper()
+    if base != BASE_CURRENCY:
+        # Rebase so every rate is per one BASE_CURRENCY
+        per_base = float(rates[BASE_CURRENCY])
+        rates = {code: float(rate) / per_base for code, rate in rates.items()}
+    as_of = payload.get("as_of") or payload.get("time_last_update_unix") or time.time()
+    return FXTable(rates, float(as_of), source)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    with open(path) as f:
+        return _table_from_payload(json.load(f), "snapshot")
+
+
+def fetch_rates(url=None, timeout=5, session=None):
+    url = url or os.environ.get("FX_API_URL", DEFAULT_FX_API_URL)
+    response = (session or requests).get(url, timeout=timeout)
+    response.raise_for_status()
+    table = _table_from_payload(response.json(), url)
+    # Stamp with fetch time so the cache age reflects when we last refreshed
+    return FXTable(table.rates, time.time(), url)
+
+
+def load_rates(cache_path=None, max_age=MAX_AGE, url=None, session=None):
+    """Return the freshest usable table: cache, then network, then offline snapshot."""
+    cache_path = cache_path or data_path("fx_rates.json")
+    cached = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = _table_from_payload(json.load(f), "cache")
+        except (OSError, ValueError, KeyError):
+            cached = None
+    if cached is not None and time.time() - cached.as_of < max_age:
+        return cached
+
+    try:
+        table = fetch_rates(url, session=session)
+    except (requests.RequestException, ValueError, KeyError):
+        return cached or load_snapshot()
+
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(table.to_dict(), f)
+    os.replace(tmp_path, cache_path)
+    return table
@@ -0,0 +1,306 @@
+import datetime as dt
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from footprint import deep_sizeof
+from paths import DATA_DIR
+
+
+# Spill a session's ledger and chat after this long without an interaction
+IDLE_SECONDS = float(os.environ.get("FINANCEBOT_SESSION_IDLE_SECONDS", 15 * 60))
+# Spill least recently used sessions while resident ledgers and chats exceed this
+MEMORY_CEILING = int(float(os.environ.get("FINANCEBOT_SESSION_MEMORY_MB", 512)) * 1024 * 1024)
+# Never spill a session used more recently than this, even over the ceiling
+MIN_IDLE_SECONDS = 5.0
+# Estimated bytes per ledger row, columns, indexes and rollup share included
+# (deep_sizeof of a year of mixed expenses settles at 150-200 per row)
+LEDGER_ROW_BYTES = 200
+LEDGER_BASE_BYTES = 2500
+
+
+class ChatHistory(list):
+    """A chat history list that can be weakly referenced."""
+
+
+class _SessionRecord:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.expenses = None
+        self.chat_history = None
+        self.last_used = 0.0
+        self.busy = 0
+        self.spilled = False
+        # Set while chosen for a spill that hasn't finished, so it isn't chosen twice
+        self.spilling = False
+        self.bytes = 0
+        # Held for the file I/O of a spill or restore of this session only
+        self.io_lock = threading.Lock()
+        self._reset_chat_size()
+
+    def _reset_chat_size(self):
+        self._chat_id = None
+        self._chat_len = 0
+        self._chat_bytes = 0
+
+    def objects(self):
+        """The session's live (expenses, chat_history), or None once Streamlit dropped them."""
+        expenses = self.expenses() if self.expenses is not None else None
+        chat_history = self.chat_history() if self.chat_history is not None else None
+        if expenses is None or chat_history is None:
+            return None
+        return expenses, chat_history
+
+    def measure(self):
+        """Estimate resident bytes in time proportional to what changed since the last call.
+
+        Runs under the manager's lock on every run, so the ledger is costed
+        per row and only chat messages added since the last call are sized.
+        """
+        objects = self.objects()
+        if objects is None:
+            return 0
+        expenses, chat_history = objects
+        if id(chat_history) != self._chat_id or len(chat_history) < self._chat_len:
+            # A new or shortened chat, e.g. after a reset: size it from scratch
+            self._reset_chat_size()
+            self._chat_id = id(chat_history)
+        for message in chat_history[self._chat_len:]:
+            self._chat_bytes += deep_sizeof(message)
+        self._chat_len = len(chat_history)
+        self.bytes = (LEDGER_BASE_BYTES + len(expenses) * LEDGER_ROW_BYTES
+                      + sys.getsizeof(chat_history) + self._chat_bytes)
+        return self.bytes
+
+
+# --- Compact spill files ---
+def write_ledger(path, expenses):
+    """Write the ledger as compressed column arrays with factorized labels."""
+    categories, amounts, currencies, dates = expenses.columns()
+    category_codes, category_labels = pd.factorize(pd.Series(categories, dtype=object))
+    currency_codes, currency_labels = pd.factorize(pd.Series(currencies, dtype=object))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            category_codes=category_codes.astype(np.int16),
+            category_labels=np.asarray(category_labels, dtype=str),
+            amounts=np.asarray(amounts, dtype=np.float64),
+            currency_codes=currency_codes.astype(np.int16),
+            currency_labels=np.asarray(currency_labels, dtype=str),
+            dates=np.fromiter((d.toordinal() for d in dates), dtype=np.int32, count=len(dates)),
+        )
+    os.replace(tmp_path, path)
+
+
+def read_ledger(path, expenses):
+    """Replay a spilled ledger into an (empty) store, rebuilding its rollups."""
+    with np.load(path) as data:
+        categories = data["category_labels"][data["category_codes"]].tolist()
+        currencies = data["currency_labels"][data["currency_codes"]].tolist()
+        amounts = data["amounts"].tolist()
+        dates = [dt.date.fromordinal(int(d)) for d in data["dates"]]
+    expenses.extend(zip(categories, amounts, dates, currencies))
+
+
+def write_chat(path, chat_history):
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for user_msg, bot_msg in chat_history:
+            f.write(json.dumps([str(user_msg), str(bot_msg)]) + "\n")
+    os.replace(tmp_path, path)
+
+
+def read_chat(path, chat_history):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        chat_history.extend(tuple(json.loads(line)) for line in f)
+
+
+class IdleSessionManager:
+    """Bounds the memory held by idle sessions' ledgers and chat histories.
+
+    Each rerun, fragment rerun and callback runs inside `using()`, which
+    restores a spilled session before the app sees it and keeps it pinned
+    until the run ends. Sessions idle for `idle_seconds` are spilled to
+    compact files, and the least recently used are spilled early whenever
+    resident ledgers and chats exceed `memory_ceiling` bytes.
+
+    Spilling empties the session's ExpenseStore and chat list in place, so
+    the objects in its session state stay valid and are refilled on restore.
+    Only weak references are held, so a session Streamlit discards is
+    forgotten and its files removed.
+    """
+
+    def __init__(self, directory=None, idle_seconds=IDLE_SECONDS, memory_ceiling=MEMORY_CEILING,
+                 min_idle=MIN_IDLE_SECONDS, clock=time.monotonic):
+        self.directory = directory or os.path.join(DATA_DIR, "sessions")
+        self.idle_seconds = idle_seconds
+        self.memory_ceiling = memory_ceiling
+        self.min_idle = min_idle
+        self.clock = clock
+        self.spills = 0
+        self.restores = 0
+        self._records = {}
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _paths(self, session_id):
+        folder = os.path.join(self.directory, session_id)
+        return folder, os.path.join(folder, "ledger.npz"), os.path.join(folder, "chat.jsonl.gz")
+
+    # --- Per-run hooks ---
+    @contextmanager
+    def using(self, session_id, state):
+        """Restore and pin a session for the duration of a run."""
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                record = self._records[session_id] = _SessionRecord(session_id)
+            # Pinned before any I/O, so no sweep picks it while it is restored
+            record.busy += 1
+            record.last_used = self.clock()
+        try:
+            # Waits only for a spill of this same session that is still writing
+            with record.io_lock:
+                if record.spilled:
+                    self._restore(record)
+            with self._lock:
+                self._track(record, state)
+            yield
+        finally:
+            victims = []
+            with self._lock:
+                record.busy -= 1
+                record.last_used = self.clock()
+                if not record.busy:
+                    self._track(record, state)
+                    record.measure()
+                    victims = self._over_ceiling()
+            for victim in victims:
+                self._spill(victim)
+
+    def _track(self, record, state):
+        # Point the record at the session's current objects; a reset replaces them
+        if "expenses" not in state or "chat_history" not in state:
+            return
+        if type(state["chat_history"]) is list:
+            state["chat_history"] = ChatHistory(state["chat_history"])
+        record.expenses = weakref.ref(state["expenses"])
+        record.chat_history = weakref.ref(state["chat_history"])
+
+    # --- Spilling ---
+    # The manager lock only guards bookkeeping; files are written and read
+    # under the record's io_lock, so a slow disk stalls just that session.
+    def _spill(self, record):
+        try:
+            with record.io_lock:
+                with self._lock:
+                    if record.busy or record.spilled:
+                        return
+                    objects = record.objects()
+                if objects is None:
+                    return
+                expenses, chat_history = objects
+                folder, ledger_path, chat_path = self._paths(record.session_id)
+                os.makedirs(folder, exist_ok=True)
+                write_ledger(ledger_path, expenses)
+                write_chat(chat_path, chat_history)
+                with self._lock:
+                    expenses.clear()
+                    chat_history.clear()
+                    record.spilled = True
+                    record.bytes = 0
+                    record._reset_chat_size()
+                    self.spills += 1
+        finally:
+            with self._lock:
+                record.spilling = False
+
+    def _restore(self, record):
+        # Called with record.io_lock held and the record pinned
+        objects = record.objects()
+        folder, ledger_path, chat_path = self._paths(record.session_id)
+        if objects is not None:
+            expenses, chat_history = objects
+            read_ledger(ledger_path, expenses)
+            read_chat(chat_path, chat_history)
+            with self._lock:
+                self.restores += 1
+        shutil.rmtree(folder, ignore_errors=True)
+        with self._lock:
+            record.spilled = False
+
+    def _over_ceiling(self):
+        """Pick least recently used idle sessions to spill until under the ceiling. Needs self._lock."""
+        resident = sorted(
+            (r for r in self._records.values()
+             if not r.spilled and not r.spilling and r.objects() is not None),
+            key=lambda r: r.last_used
+        )
+        total = sum(r.bytes for r in resident)
+        now = self.clock()
+        victims = []
+        for record in resident:
+            if total <= self.memory_ceiling:
+                break
+            if record.busy or now - record.last_used < self.min_idle:
+                continue
+            total -= record.bytes
+            record.spilling = True
+            victims.append(record)
+        return victims
+
+    def sweep(self):
+        """Spill idle sessions, forget discarded ones and enforce the ceiling."""
+        victims, forgotten = [], []
+        with self._lock:
+            now = self.clock()
+            for record in list(self._records.values()):
+                if record.busy or record.spilling:
+                    continue
+                if record.objects() is None:
+                    del self._records[record.session_id]
+                    forgotten.append(record)
+                elif not record.spilled and now - record.last_used >= self.idle_seconds:
+                    record.spilling = True
+                    victims.append(record)
+            victims += self._over_ceiling()
+        for record in forgotten:
+            shutil.rmtree(self._paths(record.session_id)[0], ignore_errors=True)
+        for record in victims:
+            self._spill(record)
+
+    # --- Background sweeping ---
+    def start(self, interval=30.0):
+        def run():
+            while not self._stop.wait(interval):
+                self.sweep()
+
+        self._thread = threading.Thread(target=run, name="idle-session-sweeper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            resident = [r for r in self._records.values() if not r.spilled and r.objects() is not None]
+            return {
+                "sessions": len(self._records),
+                "resident": len(resident),
+                "spilled": sum(r.spilled for r in self._records.values()),
+                "resident_bytes": sum(r.bytes for r in resident),
+                "spills": self.spills,
+                "restores": self.restores,
+            }
@@ -0,0 +1,270 @@
+"""Offline evaluation of the intent classifier.
+
+Runs a labeled query corpus through a classifier backend and reports
+accuracy, a confusion matrix, latency percentiles and token usage:
+
+    python intent_eval.py --backend llm
+    python intent_eval.py --backend llm --batch-size 20 --cache .cache/intents.json
+    python intent_eval.py --backend keyword
+
+With --relabel, unlabeled queries (one per line) are classified in batches
+and written out as a labeled corpus instead.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from intents import (
+    BATCH_SYSTEM_INSTRUCTION,
+    INTENT_LABELS,
+    SYSTEM_INSTRUCTION,
+    build_batch_prompt,
+    build_prompt,
+    keyword_intent,
+    normalize_intent,
+    parse_batch_response,
+)
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_corpus.jsonl")
+DEFAULT_ENDPOINT = "https://models.inference.ai.azure.com"
+DEFAULT_MODEL = "gpt-4o"
+
+
+class Classification:
+    """One backend answer: the routed label plus what it cost to get."""
+
+    def __init__(self, label, raw=None, prompt_tokens=0, completion_tokens=0):
+        self.label = label
+        self.raw = raw if raw is not None else label
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+# --- Backends ---
+class LLMBackend:
+    """Classifies with the same prompt classify_intent sends to the model."""
+
+    def __init__(self, client, model=DEFAULT_MODEL, max_tokens=300):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def _complete(self, prompt, system_instruction, max_tokens):
+        response = self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_instruction},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            max_tokens=max_tokens,
+            model=self.model
+        )
+        usage = response.usage
+        return (
+            response.choices[0].message.content,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+    def classify(self, query):
+        raw, prompt_tokens, completion_tokens = self._complete(
+            build_prompt(query), SYSTEM_INSTRUCTION, self.max_tokens
+        )
+        raw = raw.strip().lower()
+        return Classification(normalize_intent(raw), raw, prompt_tokens, completion_tokens)
+
+    def classify_batch(self, queries):
+        # Room for one quoted label per query
+        max_tokens = max(self.max_tokens, 8 * len(queries))
+        raw, prompt_tokens, completion_tokens = self._complete(
+            build_batch_prompt(queries), BATCH_SYSTEM_INSTRUCTION, max_tokens
+        )
+        labels = parse_batch_response(raw, len(queries))
+        # Token cost is shared evenly across the queries in the request
+        n = len(queries)
+        return [
+            Classification(normalize_intent(label), label.strip().lower(), prompt_tokens / n, completion_tokens / n)
+            for label in labels
+        ]
+
+
+class KeywordBackend:
+    """Local keyword baseline; free and instant, useful as a floor.
+
+    The same rules serve as the app's classifier when the model is down.
+    """
+
+    def classify(self, query):
+        return Classification(keyword_intent(query))
+
+    def classify_batch(self, queries):
+        return [self.classify(q) for q in queries]
+
+
+class CachedBackend:
+    """Wraps another backend with a persistent query -> raw label cache."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.hits = 0
+        self._cache = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._cache = json.load(f)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self._cache, f, indent=1, sort_keys=True)
+
+    def classify(self, query):
+        if query in self._cache:
+            self.hits += 1
+            return Classification(normalize_intent(self._cache[query]), self._cache[query])
+        result = self.backend.classify(query)
+        self._cache[query] = result.raw
+        return result
+
+    def classify_batch(self, queries):
+        misses = [q for q in dict.fromkeys(queries) if q not in self._cache]
+        fresh = {}
+        if misses:
+            for query, result in zip(misses, self.backend.classify_batch(misses)):
+                self._cache[query] = result.raw
+                fresh[query] = result
+        self.hits += len(queries) - len(fresh)
+        return [
+            fresh.pop(q) if q in fresh else Classification(normalize_intent(self._cache[q]), self._cache[q])
+            for q in queries
+        ]
+
+
+# --- Evaluation ---
+def load_corpus(path):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["query"], row["intent"]) for row in rows]
+
+
+def classify_all(backend, queries, batch_size=None):
+    """Classify every query, returning (results, per-query latencies in ms)."""
+    results, latencies = [], []
+    if batch_size and batch_size > 1:
+        for i in range(0, len(queries), batch_size):
+            chunk = queries[i:i + batch_size]
+            started = time.perf_counter()
+            results.extend(backend.classify_batch(chunk))
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies.extend([elapsed / len(chunk)] * len(chunk))
+    else:
+        for query in queries:
+            started = time.perf_counter()
+            results.append(backend.classify(query))
+            latencies.append((time.perf_counter() - started) * 1000)
+    return results, latencies
+
+
+def evaluate(backend, corpus, batch_size=None):
+    """Score a backend against (query, expected_intent) pairs."""
+    queries = [q for q, _ in corpus]
+    expected = [label for _, label in corpus]
+    results, latencies = classify_all(backend, queries, batch_size)
+    predicted = [r.label for r in results]
+
+    confusion = pd.crosstab(
+        pd.Categorical(expected, categories=INTENT_LABELS),
+        pd.Categorical(predicted, categories=INTENT_LABELS),
+        rownames=["expected"],
+        colnames=["predicted"],
+        dropna=False
+    )
+    correct = sum(e == p for e, p in zip(expected, predicted))
+    return {
+        "queries": len(corpus),
+        "accuracy": correct / len(corpus) if corpus else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "latency_p99_ms": float(np.percentile(latencies, 99)) if latencies else 0.0,
+        "tokens_per_query": sum(r.tokens for r in results) / len(corpus) if corpus else 0.0,
+        "confusion": confusion,
+        "errors": [
+            {"query": q, "expected": e, "predicted": r.label, "raw": r.raw}
+            for q, e, r in zip(queries, expected, results) if e != r.label
+        ],
+    }
+
+
+def print_report(report):
+    print(f"Queries:          {report['queries']}")
+    print(f"Accuracy:         {report['accuracy']:.1%}")
+    print(f"Latency p50:      {report['latency_p50_ms']:.1f} ms")
+    print(f"Latency p99:      {report['latency_p99_ms']:.1f} ms")
+    print(f"Tokens per query: {report['tokens_per_query']:.1f}")
+    print()
+    print(report["confusion"].to_string())
+    if report["errors"]:
+        print()
+        print("Misclassified:")
+        for error in report["errors"]:
+            print(f"  [{error['expected']} -> {error['predicted']}] {error['query']} (raw: {error['raw']!r})")
+
+
+def make_backend(args):
+    if args.backend == "keyword":
+        backend = KeywordBackend()
+    else:
+        from openai import OpenAI
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        client = OpenAI(base_url=args.endpoint, api_key=os.environ.get("GITHUB_TOKEN"))
+        backend = LLMBackend(client, args.model)
+    if args.cache:
+        backend = CachedBackend(backend, args.cache)
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the FinanceBot intent classifier offline.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL file of {query, intent} rows")
+    parser.add_argument("--backend", choices=("llm", "keyword"), default="llm")
+    parser.add_argument("--endpoint", default=os.environ.get("MODELS_ENDPOINT", DEFAULT_ENDPOINT))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=None, help="Classify this many queries per request")
+    parser.add_argument("--cache", help="JSON file caching raw labels between runs")
+    parser.add_argument("--relabel", help="Text file of unlabeled queries, one per line")
+    parser.add_argument("--output", help="Where --relabel writes its JSONL corpus (default: stdout)")
+    args = parser.parse_args()
+
+    backend = make_backend(args)
+
+    if args.relabel:
+        with open(args.relabel) as f:
+            queries = [line.strip() for line in f if line.strip()]
+        results, _ = classify_all(backend, queries, args.batch_size or 20)
+        lines = [json.dumps({"query": q, "intent": r.label}) for q, r in zip(queries, results)]
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write("\n".join(lines) + "\n")
+        else:
+            print("\n".join(lines))
+    else:
+        print_report(evaluate(backend, load_corpus(args.corpus), args.batch_size))
+
+    if isinstance(backend, CachedBackend):
+        backend.save()
+        print(f"Cache hits: {backend.hits}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import json
+import re
+
+
+INTENT_LABELS = (
+    "budget_setup",
+    "add_expense",
+    "investment_tips",
+    "view_report",
+    "help",
+    "goodbye",
+    "other",
+)
+
+SYSTEM_INSTRUCTION = "You are a finance intent classifier. Respond with only the intent label in lowercase, no explanation."
+
+BATCH_SYSTEM_INSTRUCTION = "You are a finance intent classifier. Respond with only a JSON array of intent labels in lowercase, one per query, in the same order, no explanation."
+
+INTENT_DESCRIPTIONS = """    - budget_setup: Setting or adjusting budgets.
+    - add_expense: Logging expenses or tracking spending.
+    - investment_tips: Advice on stocks, crypto, retirement or any investments.
+    - view_report: Summary of expenses/budgets or financial reports.
+    - help: User needs assistance or examples of what they can ask.
+    - goodbye: Ending the chat or expressing thanks/farewell.
+    - other: Queries not clearly matching the above categories."""
+
+
+# Ordered (label, keywords) rules for classifying without the model; the
+# first rule with a keyword in the query wins
+KEYWORD_INTENTS = (
+    ("view_report", ("report", "summar", "how am i doing", "show me my", "breakdown", "where am i spending", "so far")),
+    ("budget_setup", ("budget", "allocate", "spending plan", "50/30/20", "plan for")),
+    ("add_expense", ("spent", "expense", "log", "track", "record", "paid", "bought")),
+    ("investment_tips", ("invest", "stock", "crypto", "bitcoin", "retire", "401k", "ira", "etf", "index fund")),
+    ("goodbye", ("bye", "thanks", "thank you", "that's all", "see you", "signing off")),
+    ("help", ("help", "what can you", "what can i ask", "how do i use", "examples", "how does this work")),
+)
+
+
+def keyword_intent(query):
+    """Classify a query with KEYWORD_INTENTS alone; used when the model is unavailable."""
+    text = query.lower()
+    for label, keywords in KEYWORD_INTENTS:
+        if any(k in text for k in keywords):
+            return label
+    return "other"
+
+
+def build_prompt(query):
+    return f"""Classify this finance-related query into one of:
+{INTENT_DESCRIPTIONS}
+
+    User query: {query}
+    Intent:"""
+
+
+def build_batch_prompt(queries):
+    numbered = "\n".join(f"    {i}. {q}" for i, q in enumerate(queries, 1))
+    return f"""Classify each of these finance-related queries into one of:
+{INTENT_DESCRIPTIONS}
+
+    User queries:
+{numbered}
+
+    Return a JSON array with exactly {len(queries)} labels.
+    Intents:"""
+
+
+def normalize_intent(raw):
+    """Map a raw classifier reply to the label chat_page would route it to.
+
+    The chat page matches replies by substring, in this order, so a reply
+    such as "view_report (expense summary)" is routed as an expense.
+    """
+    intent = (raw or "").strip().lower()
+    if "budget" in intent:
+        return "budget_setup"
+    if "expense" in intent:
+        return "add_expense"
+    if "investment" in intent:
+        return "investment_tips"
+    if "report" in intent or "view" in intent:
+        return "view_report"
+    if "help" in intent:
+        return "help"
+    if "goodbye" in intent or "bye" in intent:
+        return "goodbye"
+    return "other"
+
+
+def parse_batch_response(text, count):
+    """Split a batched reply into `count` raw labels, padding with "other"."""
+    labels = None
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    if match:
+        try:
+            labels = [str(label) for label in json.loads(match.group(0))]
+        except ValueError:
+            labels = None
+    if labels is None:
+        # Fall back to one label per line, dropping list numbering
+        labels = [
+            re.sub(r"^\s*\d+[.)]\s*", "", line).strip()
+            for line in (text or "").splitlines() if line.strip()
+        ]
+    labels = labels[:count]
+    return labels + ["other"] * (count - len(labels))
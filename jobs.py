@@ -0,0 +1,254 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+from paths import data_path
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# First retry waits this long, doubling on every further attempt
+RETRY_BACKOFF = 5.0
+# A claimed job is handed to another worker if not finished within this time
+LEASE_SECONDS = 120.0
+BATCH_SIZE = 20
+POLL_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    locked_until REAL NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+
+class Job:
+    def __init__(self, id, kind, payload, attempts, lease_token=None):
+        self.id = id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        # Identifies this claim; a re-claim after the lease expires gets a new one
+        self.lease_token = lease_token
+
+
+class JobQueue:
+    """Durable job queue backed by a single SQLite file.
+
+    Jobs survive restarts: a job claimed by a worker that dies is picked up
+    again once its lease expires. Several processes can share one file.
+    """
+
+    def __init__(self, path=None, max_attempts=MAX_ATTEMPTS,
+                 retry_backoff=RETRY_BACKOFF, lease_seconds=LEASE_SECONDS):
+        self.path = path or data_path("jobs.sqlite3")
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        # Lets enqueue wake idle workers instead of waiting out the poll interval
+        self.wakeup = threading.Condition()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_token" not in columns:
+                # Queue files created before leases were tokened
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_token TEXT")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, delay=0.0):
+        """Add a job and return its id. Never blocks on job execution."""
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO jobs (kind, payload, run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload), now + delay, now, now)
+        )
+        with self.wakeup:
+            self.wakeup.notify()
+        return cursor.lastrowid
+
+    def claim(self, batch_size=BATCH_SIZE, kinds=None):
+        """Atomically lease up to batch_size ready jobs of a single kind."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A worker that died on its last attempt must not hand the job out again
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', locked_until = 0,"
+                " last_error = COALESCE(last_error, 'Lease expired on the final attempt'), updated_at = ?"
+                " WHERE status = 'running' AND locked_until <= ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            kind_filter = ""
+            params = [now, now]
+            if kinds:
+                kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+                params.extend(kinds)
+            first = conn.execute(
+                "SELECT kind FROM jobs WHERE ((status = 'pending' AND run_after <= ?)"
+                " OR (status = 'running' AND locked_until <= ?))" + kind_filter +
+                " ORDER BY id LIMIT 1",
+                params
+            ).fetchone()
+            if first is None:
+                conn.execute("COMMIT")
+                return []
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs WHERE kind = ?"
+                " AND ((status = 'pending' AND run_after <= ?) OR (status = 'running' AND locked_until <= ?))"
+                " ORDER BY id LIMIT ?",
+                (first[0], now, now, batch_size)
+            ).fetchall()
+            token = uuid.uuid4().hex
+            conn.executemany(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?, lease_token = ?,"
+                " updated_at = ? WHERE id = ?",
+                [(now + self.lease_seconds, token, now, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [Job(id, kind, json.loads(payload), attempts + 1, token) for id, kind, payload, attempts in rows]
+
+    def _finish(self, job, sql, params):
+        # Only the worker holding the current lease may settle the job
+        cursor = self._connect().execute(
+            sql + " WHERE id = ? AND status = 'running' AND lease_token = ?",
+            params + (job.id, job.lease_token)
+        )
+        if cursor.rowcount == 0:
+            logger.warning("Lost the lease on job %s (attempt %s); leaving it to its new owner", job.id, job.attempts)
+            return False
+        return True
+
+    def complete(self, job):
+        """Mark a job done. Returns False if its lease was lost to another worker."""
+        return self._finish(
+            job, "UPDATE jobs SET status = 'done', last_error = NULL, lease_token = NULL, updated_at = ?",
+            (time.time(),)
+        )
+
+    def fail(self, job, error):
+        """Schedule a retry with exponential backoff, or give up after max_attempts.
+
+        Returns False if the job's lease was lost to another worker.
+        """
+        now = time.time()
+        if job.attempts >= self.max_attempts:
+            status, run_after = "failed", now
+        else:
+            status, run_after = "pending", now + self.retry_backoff * 2 ** (job.attempts - 1)
+        return self._finish(
+            job,
+            "UPDATE jobs SET status = ?, run_after = ?, locked_until = 0, lease_token = NULL, last_error = ?,"
+            " updated_at = ?",
+            (status, run_after, str(error)[:1000], now)
+        )
+
+    def counts(self):
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def purge(self, older_than=7 * 24 * 3600):
+        """Delete finished jobs older than the given age in seconds."""
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+            (time.time() - older_than,)
+        )
+
+
+class WorkerPool:
+    """Background threads that drain a JobQueue in batches.
+
+    Handlers are registered per job kind and receive a list of payloads.
+    They return a list of the same length holding None for each payload that
+    succeeded, or the error for one that should be retried. Raising fails
+    every job in the batch.
+    """
+
+    def __init__(self, queue, workers=2, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        self.queue = queue
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"financebot-jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self.queue.wakeup:
+            self.queue.wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """Process one batch on the calling thread. Returns the number of jobs handled."""
+        jobs = self.queue.claim(self.batch_size, list(self.handlers))
+        if not jobs:
+            return 0
+        handler = self.handlers[jobs[0].kind]
+        try:
+            errors = handler([job.payload for job in jobs])
+        except Exception as e:
+            logger.exception("Job batch of kind %s failed", jobs[0].kind)
+            errors = [e] * len(jobs)
+        if errors is None or len(errors) != len(jobs):
+            logger.error("Handler for %s returned %s results for %d jobs", jobs[0].kind,
+                         "no" if errors is None else len(errors), len(jobs))
+            error = RuntimeError(f"Handler returned a result count that does not match the {len(jobs)} jobs")
+            errors = [error] * len(jobs)
+        for job, error in zip(jobs, errors):
+            if error is None:
+                self.queue.complete(job)
+            else:
+                self.queue.fail(job, error)
+        return len(jobs)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                handled = self.run_once()
+            except Exception:
+                logger.exception("Job worker error")
+                handled = 0
+            if not handled:
+                with self.queue.wakeup:
+                    self.queue.wakeup.wait(self.poll_interval)
@@ -0,0 +1,271 @@
+import calendar
+import datetime as dt
+import re
+
+from expense_parser import extract_dates, find_categories
+from fx import BASE_CURRENCY, format_money
+from recurring import merge_totals
+
+
+# A question is about the ledger if it asks about the user's own past spending...
+_SPENDING = re.compile(
+    r"\b(did|have|had) (i|we)\b.*\b(spend|spent|pay|paid|buy|bought|eat out|ate out|log|logged)\b"
+    r"|\b(i|we)('ve|'d| have| had)? (spent|paid|bought|ate out|logged)\b"
+    r"|\b(my|our)\b.*\b(spending|spend|expenses?|purchases?)\b",
+    re.IGNORECASE
+)
+# ...asks for an amount, count or total...
+_ASKING = re.compile(
+    r"\bhow (much|many|often)\b|\b(total|sum)\b|\bwhat (did|have) (i|we)\b"
+    r"|\b(what|which) (was|were|is|are|did)\b.*\b(biggest|largest|highest|most expensive|priciest|smallest|"
+    r"lowest|cheapest|least expensive|average|typical|most|least)\b"
+    r"|\b(what|which) categor(y|ies)\b",
+    re.IGNORECASE
+)
+# ...and not for advice about future spending
+_ADVICE = re.compile(r"\b(should|could|would|can i afford|recommend|suggest|ideal|save)\b", re.IGNORECASE)
+# Reports, charts and judgements of the spending belong to the report and advice flows
+_REPORT = re.compile(
+    r"\b(report|reports|summary|summari[sz]e|overview|chart|graph|breakdown|analy[sz]e|analysis|too much)\b",
+    re.IGNORECASE
+)
+
+_AGGREGATES = [
+    ("by_category", re.compile(r"\b(which|what|top|each|per|by) (categor(y|ies))\b|\bmost (on|in)\b", re.IGNORECASE)),
+    ("max", re.compile(r"\b(biggest|largest|highest|most expensive|priciest|max(imum)?)\b", re.IGNORECASE)),
+    ("min", re.compile(r"\b(smallest|lowest|cheapest|least expensive|min(imum)?)\b", re.IGNORECASE)),
+    ("average", re.compile(r"\b(average|avg|mean|typical)\b", re.IGNORECASE)),
+    ("count", re.compile(r"\bhow many\b|\bnumber of\b|\bhow often\b", re.IGNORECASE)),
+]
+
+_NUMBERS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+            "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12}
+_PERIOD = re.compile(r"\b(this|current|last|previous|past) (week|month|year)\b", re.IGNORECASE)
+_LAST_N = re.compile(
+    r"\b(?:last|past|previous) (\d+|" + "|".join(_NUMBERS) + r") (days?|weeks?|months?)\b",
+    re.IGNORECASE
+)
+_IN_MONTH = re.compile(
+    r"\bin (january|february|march|april|may|june|july|august|september|october|november|december)(?:,? (\d{4}))?\b",
+    re.IGNORECASE
+)
+_WEEKEND = re.compile(r"\b(this|last|past|previous) weekend\b", re.IGNORECASE)
+_QUARTER = re.compile(r"\b(this|current|last|previous|past) quarter\b", re.IGNORECASE)
+_NAMED_QUARTER = re.compile(r"\bq([1-4])(?:,? (\d{4}))?\b", re.IGNORECASE)
+_IN_YEAR = re.compile(r"\b(?:in|during|for|of|over) (\d{4})\b", re.IGNORECASE)
+# Any of these without a window parse_window understands means the question is out of its depth
+_TEMPORAL = re.compile(
+    r"\b(days?|weeks?|weekends?|months?|years?|quarters?|q[1-4]|\d{4}|since|between|before|after|ago|"
+    r"today|tonight|yesterday|morning|afternoon|evening|holidays?|christmas|summer|winter|spring|fall|autumn)\b",
+    re.IGNORECASE
+)
+_SINCE = re.compile(r"\bsince\b", re.IGNORECASE)
+_ALL_TIME = re.compile(r"\b(so far|in total|all time|ever|overall)\b", re.IGNORECASE)
+
+_MONTH_NUMBERS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+
+
+class LedgerQuery:
+    def __init__(self, aggregate, categories, start, end, period):
+        self.aggregate = aggregate
+        self.categories = categories
+        self.start = start
+        self.end = end
+        self.period = period
+
+
+def _month_bounds(year, month):
+    return dt.date(year, month, 1), dt.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def _quarter_bounds(year, quarter):
+    start, _ = _month_bounds(year, 3 * quarter - 2)
+    _, end = _month_bounds(year, 3 * quarter)
+    return start, end
+
+
+def parse_window(text, today):
+    """Return (start, end, description) for the time window a question names.
+
+    Returns (None, None, None) when the question mentions a time the parser
+    does not understand, so it is not answered with all-time totals.
+    """
+    match = _WEEKEND.search(text)
+    if match:
+        monday = today - dt.timedelta(days=today.weekday())
+        if match.group(1).lower() == "this" and today.weekday() >= 5:
+            return monday + dt.timedelta(days=5), today, "this weekend"
+        # Before Saturday, "this weekend" in a question about spending means the one just gone
+        return monday - dt.timedelta(days=2), monday - dt.timedelta(days=1), "last weekend"
+
+    match = _QUARTER.search(text)
+    if match:
+        quarter = (today.month - 1) // 3 + 1
+        if match.group(1).lower() in ("last", "previous", "past"):
+            year, quarter = (today.year, quarter - 1) if quarter > 1 else (today.year - 1, 4)
+            start, end = _quarter_bounds(year, quarter)
+            return start, end, "last quarter"
+        start, _ = _quarter_bounds(today.year, quarter)
+        return start, today, "this quarter"
+
+    match = _NAMED_QUARTER.search(text)
+    if match:
+        quarter = int(match.group(1))
+        year = int(match.group(2)) if match.group(2) else today.year
+        if not match.group(2) and 3 * quarter - 2 > today.month:
+            year -= 1
+        start, end = _quarter_bounds(year, quarter)
+        return start, end, f"in Q{quarter} {year}"
+
+    match = _LAST_N.search(text)
+    if match:
+        count = match.group(1).lower()
+        count = _NUMBERS.get(count) or int(count)
+        unit = match.group(2).lower().rstrip("s")
+        if unit == "month":
+            year, month = _shift_month(today.year, today.month, -count)
+            start = dt.date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+        else:
+            start = today - dt.timedelta(days=count * (7 if unit == "week" else 1) - 1)
+        return start, today, f"in the {match.group(0).lower()}"
+
+    match = _PERIOD.search(text)
+    if match:
+        which, unit = match.group(1).lower(), match.group(2).lower()
+        previous = which in ("last", "previous", "past")
+        if unit == "week":
+            monday = today - dt.timedelta(days=today.weekday())
+            if previous:
+                return monday - dt.timedelta(days=7), monday - dt.timedelta(days=1), "last week"
+            return monday, today, "this week"
+        if unit == "month":
+            if previous:
+                year, month = _shift_month(today.year, today.month, -1)
+                start, end = _month_bounds(year, month)
+                return start, end, "last month"
+            return today.replace(day=1), today, "this month"
+        if previous:
+            return dt.date(today.year - 1, 1, 1), dt.date(today.year - 1, 12, 31), "last year"
+        return dt.date(today.year, 1, 1), today, "this year"
+
+    match = _IN_MONTH.search(text)
+    if match:
+        month = _MONTH_NUMBERS[match.group(1).lower()]
+        year = int(match.group(2)) if match.group(2) else today.year
+        if not match.group(2) and (year, month) > (today.year, today.month):
+            year -= 1
+        start, end = _month_bounds(year, month)
+        return start, end, f"in {start:%B %Y}"
+
+    match = _IN_YEAR.search(text)
+    if match:
+        year = int(match.group(1))
+        return dt.date(year, 1, 1), dt.date(year, 12, 31), f"in {year}"
+
+    _, dates = extract_dates(text, today)
+    if dates:
+        date = dates[0][2]
+        since = _SINCE.search(text)
+        if since and since.start() < dates[0][0]:
+            return date, today, f"since {date:%b %d, %Y}"
+        if len(dates) >= 2:
+            start, end = sorted((dates[0][2], dates[1][2]))
+            return start, end, f"between {start:%b %d} and {end:%b %d}"
+        return date, date, f"on {date:%b %d, %Y}"
+
+    if _TEMPORAL.search(text):
+        return None, None, None
+    return None, None, "so far"
+
+
+def parse_question(text, today=None):
+    """Turn a spending question into a LedgerQuery, or None if it isn't one."""
+    if (not text or not _SPENDING.search(text) or not _ASKING.search(text) or _ADVICE.search(text)
+            or _REPORT.search(text)):
+        return None
+    today = today or dt.date.today()
+
+    aggregate = "sum"
+    for name, pattern in _AGGREGATES:
+        if pattern.search(text):
+            aggregate = name
+            break
+
+    start, end, period = parse_window(text, today)
+    if period is None:
+        # "ever spent in a day" still asks about everything; other unknown windows go to the model
+        if not _ALL_TIME.search(text):
+            return None
+        start, end, period = None, None, "so far"
+    return LedgerQuery(aggregate, find_categories(text), start, end, period)
+
+
+def _describe(categories):
+    if not categories:
+        return ""
+    if len(categories) == 1:
+        return categories[0]
+    return ", ".join(categories[:-1]) + " and " + categories[-1]
+
+
+def run_query(query, store, currency=BASE_CURRENCY, fx=None, recurring=None, today=None):
+    """Answer a LedgerQuery from the store's indexes. Returns the reply text.
+
+    Amounts are reported in `currency`, converted with `fx` when the ledger
+    holds more than one currency. Totals include charges from a recurring
+    schedule that fell due by today; the biggest/smallest lookups only
+    consider logged expenses.
+    """
+    def money(value):
+        return format_money(value, currency)
+
+    scope = _describe(query.categories)
+    on_scope = f" on {scope}" if scope else ""
+
+    if query.aggregate in ("max", "min"):
+        rows = store.rows_between(query.start, query.end, query.categories or None)
+        if not rows:
+            return f"You haven't logged any {scope + ' ' if scope else ''}expenses {query.period}."
+        # Compare converted amounts so a large yen figure doesn't beat a small dollar one
+        converted = store.amounts_for(rows, currency, fx)
+        best = converted.argmax() if query.aggregate == "max" else converted.argmin()
+        category, amount, date, logged_in = store.row(rows[best])
+        shown = money(converted[best])
+        if logged_in != currency:
+            shown = f"{format_money(amount, logged_in)} (≈ {shown})"
+        size = "biggest" if query.aggregate == "max" else "smallest"
+        return f"Your {size} {scope + ' ' if scope else ''}expense {query.period} was {shown} ({category}) on {date:%b %d, %Y}."
+
+    totals = store.totals_between(query.start, query.end, query.categories or None, currency, fx)
+    if recurring:
+        today = today or dt.date.today()
+        due = min(query.end or today, today)
+        totals = merge_totals(totals, recurring.totals_between(query.start, due, query.categories, currency, fx))
+    amount = sum(a for a, _ in totals.values())
+    count = sum(c for _, c in totals.values())
+    if not count:
+        return f"You haven't logged any {scope + ' ' if scope else ''}expenses {query.period}."
+
+    if query.aggregate == "by_category":
+        ranked = sorted(totals.items(), key=lambda kv: -kv[1][0])
+        lines = [f"Here's where your money went {query.period} ({money(amount)} total):"]
+        lines += [f"• {category}: {money(a)} ({a / amount:.0%})" for category, (a, _) in ranked]
+        return "\n".join(lines)
+    if query.aggregate == "count":
+        return f"You logged {count} {scope + ' ' if scope else ''}expense{'s' if count != 1 else ''} {query.period}, totalling {money(amount)}."
+    if query.aggregate == "average":
+        return f"Your average {scope + ' ' if scope else ''}expense {query.period} was {money(amount / count)} across {count} expense{'s' if count != 1 else ''}."
+    return f"You spent {money(amount)}{on_scope} {query.period} across {count} expense{'s' if count != 1 else ''}."
+
+
+def answer_question(text, store, today=None, currency=BASE_CURRENCY, fx=None, recurring=None):
+    """Answer a spending question locally, or return None to defer to the model."""
+    query = parse_question(text, today)
+    if query is None:
+        return None
+    return run_query(query, store, currency, fx, recurring, today)
@@ -0,0 +1,367 @@
+"""Multi-session load generator for the FinanceBot app.
+
+Drives N concurrent sessions through onboarding and a mix of chat turns
+using Streamlit's AppTest, against a local stub of the model, CoinGecko and
+exchange-rate endpoints, so no network or API quota is used:
+
+    python loadtest.py --sessions 50 --processes 4 --turns 30
+    python loadtest.py --sessions 200 --processes 8 --model-latency 300 --output load.json
+
+With --cassettes DIR the run's upstream traffic is recorded (see
+cassettes.py); adding --replay re-runs the same conversations from those
+cassettes without starting the stubs, for repeatable benchmarks:
+
+    python loadtest.py --sessions 20 --cassettes cassettes/
+    python loadtest.py --sessions 20 --cassettes cassettes/ --replay --replay-latency recorded
+
+Sessions are spread over worker processes. Each worker keeps all of its
+sessions resident and interleaves their turns, as one Streamlit server
+holds many idle sessions between reruns, so its RSS growth divided by its
+session count approximates the memory one more user costs. The report
+gives throughput, p50/p95/p99 turn latency (overall and per turn kind)
+and per-session memory broken down by user_data, expenses and chat_history.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from footprint import resident_memory, session_footprint
+from intent_eval import KeywordBackend
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fx_snapshot.json")
+SESSION_KEYS = ("user_data", "expenses", "chat_history")
+# Replayed runs never connect, so any endpoint will do
+REPLAY_ENVIRON = {
+    "MODELS_ENDPOINT": "http://replay.invalid",
+    "COINGECKO_API_URL": "http://replay.invalid/simple/price",
+    "FX_API_URL": "http://replay.invalid/fx/latest",
+}
+
+# (kind, weight, message templates)
+TURN_MIX = (
+    ("expense", 35, (
+        "I spent ${amount} on groceries",
+        "paid ${amount} for dinner yesterday",
+        "${amount} on uber and ${small} on coffee",
+        "spent €{amount} on movies",
+        "bought clothes for ${amount}",
+    )),
+    ("question", 15, (
+        "How much did I spend on groceries this month?",
+        "What was my biggest expense this week?",
+        "How many dining out expenses did I log last week?",
+    )),
+    ("budget", 10, ("Help me create a budget", "How should I allocate my income?")),
+    ("investment", 10, ("What should I invest in?", "Give me retirement advice")),
+    ("report", 10, ("Show me my spending report", "Give me a summary of my finances")),
+    ("help", 5, ("What can I ask you?",)),
+    ("other", 15, ("What is a credit score?", "Is it better to rent or buy?")),
+)
+
+_QUERY = re.compile(r"User query:\s*(.*)")
+
+
+# --- Stub services ---
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/simple/price"):
+            params = parse_qs(url.query)
+            currency = params.get("vs_currencies", ["usd"])[0]
+            self._send_json({"bitcoin": {currency: 65000.0}})
+        elif url.path.endswith("/market_chart/range"):
+            # Hourly random walk over the requested window
+            params = parse_qs(url.query)
+            start, end = int(params["from"][0]), int(params["to"][0])
+            hours = np.arange(start - start % 3600 + 3600, end + 1, 3600)
+            prices = 65000.0 + np.cumsum(np.random.default_rng(start).normal(0, 150, len(hours)))
+            self._send_json({"prices": [[int(t) * 1000, float(p)] for t, p in zip(hours, prices)]})
+        elif url.path.endswith("/fx/latest"):
+            with open(SNAPSHOT_PATH) as f:
+                self._send_json(json.load(f))
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": "not found"}, 404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = request["messages"][-1]["content"]
+        time.sleep(self.server.model_latency)
+
+        match = _QUERY.search(prompt)
+        if match:
+            content = self.server.classifier.classify(match.group(1).strip()).label
+        else:
+            content = "- Keep an emergency fund.\n- Invest in low-cost index funds.\n- Max out your employer match."
+        prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 4
+        completion_tokens = len(content) // 4
+        self._send_json({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class StubServer:
+    """Local stand-in for the model, CoinGecko and exchange-rate endpoints."""
+
+    def __init__(self, model_latency=0.05, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.model_latency = model_latency
+        self._server.classifier = KeywordBackend()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environ(self):
+        return {
+            "MODELS_ENDPOINT": self.url,
+            "COINGECKO_API_URL": f"{self.url}/simple/price",
+            "FX_API_URL": f"{self.url}/fx/latest",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- Sessions ---
+def pick_turn(rng):
+    kinds = [kind for kind, _, _ in TURN_MIX]
+    weights = [weight for _, weight, _ in TURN_MIX]
+    index = rng.choices(range(len(kinds)), weights)[0]
+    template = rng.choice(TURN_MIX[index][2])
+    return kinds[index], template.format(amount=rng.randint(5, 250), small=rng.randint(2, 9))
+
+
+def _click(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button.click().run()
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def _timed(latencies, kind, action):
+    """Run one rerun, record its latency and return whether it failed."""
+    started = time.perf_counter()
+    try:
+        failed = bool(action().exception)
+    except Exception:
+        failed = True
+    latencies.append((kind, (time.perf_counter() - started) * 1000))
+    return failed
+
+
+def run_worker(numbers, turns, seed, timeout, environ):
+    """Keep every session in `numbers` resident in this process and interleave their turns.
+
+    AppTest swaps process-global runtime state on each run, so a process
+    drives one rerun at a time; parallelism comes from running several
+    workers. AppTest compiles app.py afresh on every run, which a running
+    server does once, so latencies include that cost. Returns per-session
+    measurements and (RSS growth, sessions it covers), measured after the
+    first session has loaded the app's imports.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.update(environ)
+    rss_before = None
+
+    sessions = []
+    for number in numbers:
+        rng = random.Random(seed + number)
+        at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+        def onboard():
+            at.run()
+            at.text_input(key="name_input").input(f"Load User {number}")
+            at.text_input(key="email_input").input(f"user{number}@example.com")
+            at.number_input(key="income_input").set_value(float(rng.randint(2000, 12000)))
+            return _click(at, "Start My Financial Journey")
+
+        latencies = []
+        errors = int(_timed(latencies, "onboarding", onboard))
+        sessions.append({"at": at, "rng": rng, "latencies": latencies, "errors": errors})
+        if rss_before is None:
+            rss_before = resident_memory()
+
+    for _ in range(turns):
+        for session in sessions:
+            kind, message = pick_turn(session["rng"])
+            message_input = session["at"].text_input(key="message")
+            session["errors"] += _timed(session["latencies"], kind, lambda: message_input.input(message).run())
+
+    rss_after = resident_memory()
+    results = [
+        {
+            "latencies": session["latencies"],
+            "errors": session["errors"],
+            "footprint": session_footprint(session["at"].session_state, SESSION_KEYS),
+        }
+        for session in sessions
+    ]
+    rss_growth = None
+    if len(sessions) > 1 and rss_before is not None and rss_after is not None:
+        rss_growth = (rss_after - rss_before, len(sessions) - 1)
+    return results, rss_growth
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    return {f"p{q}": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+
+def run_load(sessions, processes, turns, seed=0, timeout=60):
+    """Spread sessions round-robin over worker processes and aggregate the results."""
+    environ = {key: os.environ[key] for key in (
+        "MODELS_ENDPOINT", "COINGECKO_API_URL", "FX_API_URL", "GITHUB_TOKEN", "FINANCEBOT_DATA_DIR",
+        "FINANCEBOT_CASSETTES", "FINANCEBOT_CASSETTE_DIR", "FINANCEBOT_CASSETTE_LATENCY"
+    ) if key in os.environ}
+    shards = [shard for shard in (list(range(sessions))[i::processes] for i in range(processes)) if shard]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [pool.submit(run_worker, shard, turns, seed, timeout, environ) for shard in shards]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    results = [result for worker_results, _ in outcomes for result in worker_results]
+    by_kind = {}
+    for result in results:
+        for kind, ms in result["latencies"]:
+            by_kind.setdefault(kind, []).append(ms)
+    chat_latencies = [ms for kind, values in by_kind.items() if kind != "onboarding" for ms in values]
+    turn_count = len(chat_latencies)
+
+    memory = {}
+    for key in SESSION_KEYS + ("total",):
+        sizes = [r["footprint"][key] for r in results]
+        memory[key] = {"mean_bytes": float(np.mean(sizes)), "max_bytes": int(max(sizes))}
+
+    report = {
+        "sessions": sessions,
+        "processes": len(shards),
+        "turns": turn_count,
+        "errors": sum(r["errors"] for r in results),
+        "elapsed_s": elapsed,
+        "turns_per_s": turn_count / elapsed if elapsed else 0.0,
+        "sessions_per_s": sessions / elapsed if elapsed else 0.0,
+        "latency_ms": _percentiles(chat_latencies),
+        "latency_by_kind_ms": {kind: _percentiles(values) for kind, values in sorted(by_kind.items())},
+        "session_memory": memory,
+    }
+    growth = [g for _, g in outcomes if g is not None]
+    if growth:
+        report["rss_growth_per_session_bytes"] = sum(g for g, _ in growth) / sum(n for _, n in growth)
+    return report
+
+
+def print_report(report):
+    mib = 1024 * 1024
+    print(f"Sessions:         {report['sessions']} resident across {report['processes']} processes")
+    print(f"Turns:            {report['turns']} ({report['errors']} errors)")
+    print(f"Elapsed:          {report['elapsed_s']:.1f} s")
+    print(f"Throughput:       {report['turns_per_s']:.1f} turns/s, {report['sessions_per_s']:.2f} sessions/s")
+    latency = report["latency_ms"]
+    print(f"Turn latency:     p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+    print()
+    print("Latency by turn kind (ms):")
+    for kind, values in report["latency_by_kind_ms"].items():
+        print(f"  {kind:<12} p50 {values['p50']:>7.0f}  p95 {values['p95']:>7.0f}  p99 {values['p99']:>7.0f}")
+    print()
+    print("Session state per session:")
+    for key, values in report["session_memory"].items():
+        print(f"  {key:<12} mean {values['mean_bytes'] / 1024:>9.1f} KiB  max {values['max_bytes'] / 1024:>9.1f} KiB")
+    if "rss_growth_per_session_bytes" in report:
+        growth = report["rss_growth_per_session_bytes"]
+        print(f"  RSS growth   {growth / mib:.2f} MiB per resident session (includes Streamlit's own state)")
+        if growth > 0:
+            print(f"  ≈ {int(1024 * mib // growth)} sessions per GiB of headroom")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent FinanceBot sessions against local stubs.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes driving sessions in parallel")
+    parser.add_argument("--turns", type=int, default=20, help="Chat turns per session after onboarding")
+    parser.add_argument("--model-latency", type=float, default=50, help="Stub model response delay in ms")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="Per-rerun timeout in seconds")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    parser.add_argument("--cassettes", metavar="DIR", help="Record upstream traffic to DIR, or replay it with --replay")
+    parser.add_argument("--replay", action="store_true", help="Replay --cassettes offline instead of starting the stubs")
+    parser.add_argument("--replay-latency", default="recorded",
+                        help='Replay delay: "recorded" or a fixed number of seconds per call')
+    args = parser.parse_args()
+    if args.replay and not args.cassettes:
+        parser.error("--replay needs --cassettes")
+
+    if args.cassettes:
+        os.environ["FINANCEBOT_CASSETTES"] = "replay" if args.replay else "record"
+        os.environ["FINANCEBOT_CASSETTE_DIR"] = os.path.abspath(args.cassettes)
+        os.environ["FINANCEBOT_CASSETTE_LATENCY"] = args.replay_latency
+
+    with nullcontext() if args.replay else StubServer(args.model_latency / 1000) as stub:
+        os.environ.update(REPLAY_ENVIRON if stub is None else stub.environ())
+        os.environ.setdefault("GITHUB_TOKEN", "loadtest")
+        # Keep job and rate caches out of the real data directory
+        os.environ["FINANCEBOT_DATA_DIR"] = tempfile.mkdtemp(prefix="financebot-load-")
+        report = run_load(args.sessions, args.processes, args.turns, args.seed, args.timeout)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
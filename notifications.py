@@ -0,0 +1,166 @@
+import os
+import smtplib
+from datetime import date
+from email.message import EmailMessage
+
+from recurring import combined_category_totals
+
+
+SUMMARY_JOB = "session_summary"
+TIPS_JOB = "financial_tips"
+
+FINANCIAL_TIPS = [
+    "Track all expenses, even small ones - they add up!",
+    "Follow the 50/30/20 budget rule when possible.",
+    "Build an emergency fund of 3-6 months of expenses.",
+    "Start investing early, even with small amounts.",
+    "Automate your savings so they happen before you can spend them.",
+    "Review subscriptions every few months and cancel the ones you don't use.",
+]
+
+
+class SMTPSettings:
+    """SMTP connection details, read from the environment by default."""
+
+    def __init__(self, host=None, port=None, username=None, password=None,
+                 sender=None, starttls=None):
+        self.host = host or os.environ.get("SMTP_HOST", "localhost")
+        self.port = int(port or os.environ.get("SMTP_PORT", 25))
+        self.username = username if username is not None else os.environ.get("SMTP_USERNAME")
+        self.password = password if password is not None else os.environ.get("SMTP_PASSWORD")
+        self.sender = sender or os.environ.get("SMTP_FROM", "FinanceBot <financebot@localhost>")
+        if starttls is None:
+            starttls = os.environ.get("SMTP_STARTTLS", "").lower() in ("1", "true", "yes")
+        self.starttls = starttls
+
+
+# --- Payloads (built on the request path, so kept small and JSON-safe) ---
+def session_summary_payload(user_data, expenses, chat_history, budget_status=None, consent=False, fx=None,
+                            recurring=None):
+    """Snapshot what the summary email needs from the session.
+
+    Totals are converted to USD with `fx` so they line up with the income,
+    and include recurring charges that have fallen due.
+    """
+    by_category = expenses.category_totals(fx=fx)
+    if recurring:
+        by_category = combined_category_totals(expenses, recurring, date.today(), fx=fx)
+    payload = {
+        "name": user_data["name"],
+        "email": user_data["email"],
+        "income": user_data["income"],
+        "expense_count": len(expenses),
+        "total_spent": sum(by_category.values()),
+        "by_category": by_category,
+        "chat_history": [[str(user), str(bot)] for user, bot in chat_history],
+        "include_tips": bool(consent),
+    }
+    if budget_status is not None:
+        payload["budget"] = budget_status[["Category", "Budget", "Spent", "Remaining"]].to_dict("records")
+    return payload
+
+
+def tips_payload(user_data):
+    return {"name": user_data["name"], "email": user_data["email"], "income": user_data["income"]}
+
+
+# --- Rendering (runs on the worker) ---
+def render_session_summary(payload, sender):
+    name = payload["name"]
+    income = payload["income"]
+    total_spent = payload["total_spent"]
+
+    lines = [
+        f"Hi {name},",
+        "",
+        "Here's a summary of your FinanceBot session.",
+        "",
+        f"Monthly income:  ${income:,.2f}",
+        f"Total expenses:  ${total_spent:,.2f} across {payload['expense_count']} expenses",
+        f"Balance:         ${income - total_spent:,.2f}",
+    ]
+
+    if payload["by_category"]:
+        lines += ["", "Spending by category:"]
+        for category, amount in sorted(payload["by_category"].items(), key=lambda kv: -kv[1]):
+            lines.append(f"  - {category}: ${amount:,.2f}")
+
+    over = [row for row in payload.get("budget", []) if row["Budget"] > 0 and row["Remaining"] < 0]
+    if over:
+        lines += ["", "Over budget this month:"]
+        for row in over:
+            lines.append(f"  - {row['Category']}: ${-row['Remaining']:,.2f} over a ${row['Budget']:,.2f} budget")
+
+    if payload["chat_history"]:
+        lines += ["", "Your conversation:"]
+        for user_msg, bot_msg in payload["chat_history"]:
+            lines += [f"  You: {user_msg}", f"  FinanceBot: {bot_msg}", ""]
+
+    if payload.get("include_tips"):
+        lines += ["", "Financial tips to remember:"]
+        lines += [f"  - {tip}" for tip in FINANCIAL_TIPS[:4]]
+
+    lines += ["", "Thanks for using FinanceBot!"]
+
+    message = EmailMessage()
+    message["Subject"] = "Your FinanceBot session summary"
+    message["From"] = sender
+    message["To"] = payload["email"]
+    message.set_content("\n".join(lines))
+    return message
+
+
+def render_tips_email(payload, sender):
+    income = payload["income"]
+    lines = [
+        f"Hi {payload['name']},",
+        "",
+        "Thanks for signing up for FinanceBot tips! A few to start with:",
+        "",
+    ]
+    lines += [f"  - {tip}" for tip in FINANCIAL_TIPS]
+    lines += [
+        "",
+        f"With a monthly income of ${income:,.2f}, setting aside 20% means "
+        f"${income * 0.2:,.2f} a month toward savings and investments.",
+    ]
+
+    message = EmailMessage()
+    message["Subject"] = "Your FinanceBot financial tips"
+    message["From"] = sender
+    message["To"] = payload["email"]
+    message.set_content("\n".join(lines))
+    return message
+
+
+# --- Delivery ---
+def send_batch(messages, settings=None):
+    """Send messages over one SMTP connection, returning a per-message error list."""
+    settings = settings or SMTPSettings()
+    errors = []
+    with smtplib.SMTP(settings.host, settings.port, timeout=30) as smtp:
+        if settings.starttls:
+            smtp.starttls()
+        if settings.username:
+            smtp.login(settings.username, settings.password or "")
+        for message in messages:
+            try:
+                smtp.send_message(message)
+                errors.append(None)
+            except smtplib.SMTPException as e:
+                errors.append(e)
+    return errors
+
+
+def make_handler(render, settings=None):
+    """Build a WorkerPool handler that renders payloads and sends them in one batch."""
+    def handler(payloads):
+        smtp_settings = settings or SMTPSettings()
+        return send_batch([render(p, smtp_settings.sender) for p in payloads], smtp_settings)
+    return handler
+
+
+def register_handlers(pool, settings=None):
+    pool.register(SUMMARY_JOB, make_handler(render_session_summary, settings))
+    pool.register(TIPS_JOB, make_handler(render_tips_email, settings))
+    return pool
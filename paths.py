@@ -0,0 +1,15 @@
+import os
+
+
+# Local state (job queue, caches, snapshots) lives here unless overridden
+DATA_DIR = os.environ.get(
+    "FINANCEBOT_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".financebot")
+)
+
+
+def data_path(*parts):
+    """Return a path under DATA_DIR, creating its parent directory."""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
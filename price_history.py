@@ -0,0 +1,242 @@
+"""Historical crypto prices with a local, incrementally extended cache.
+
+Each (coin, currency) series lives in an append-only file of float64
+(timestamp, price) pairs. Refreshing only fetches points newer than the
+last one cached and appends them, so a long history is downloaded once.
+Series are reduced with Largest-Triangle-Three-Buckets before charting,
+which keeps the shape of the curve (peaks and dips included) in a few
+hundred points however long the history is.
+"""
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from paths import DATA_DIR
+
+
+DEFAULT_COINS = ("bitcoin", "ethereum")
+HISTORY_DAYS = 365
+# Points kept for charting after downsampling
+CHART_POINTS = 500
+# Don't ask CoinGecko for new points more often than this
+REFRESH_SECONDS = 300
+DEFAULT_API_BASE = "https://api.coingecko.com/api/v3"
+
+
+def chart_coins():
+    """Coins to chart, from FINANCEBOT_CHART_COINS (comma-separated CoinGecko ids)."""
+    configured = os.environ.get("FINANCEBOT_CHART_COINS")
+    if not configured:
+        return DEFAULT_COINS
+    return tuple(coin.strip().lower() for coin in configured.split(",") if coin.strip())
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept. Every other bucket keeps
+    the point forming the largest triangle with the point kept from the
+    previous bucket and the average of the next one.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges over the interior points 1..n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average of each bucket, used as the third corner of the triangles
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        # Twice the triangle area; the constant factor doesn't change the argmax
+        areas = np.abs((x[a] - avg_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(areas))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(series, n_out=CHART_POINTS):
+    """LTTB-reduce an (n, 2) array of (timestamp, price) rows."""
+    if len(series) <= n_out:
+        return series
+    return series[lttb(series[:, 0], series[:, 1], n_out)]
+
+
+class PriceHistory:
+    """Cached daily-to-minute price history per coin, shared by every session.
+
+    `call` wraps each network request, e.g. a CircuitBreaker's call, so
+    outages fall back to whatever is already cached.
+    """
+
+    def __init__(self, directory=None, session=None, api_base=None, timeout=10, call=None):
+        self.directory = directory or os.path.join(DATA_DIR, "prices")
+        self.session = session or requests.Session()
+        self.api_base = (api_base or os.environ.get("COINGECKO_API_BASE", DEFAULT_API_BASE)).rstrip("/")
+        self.timeout = timeout
+        self.call = call or (lambda func, *args, **kwargs: func(*args, **kwargs))
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._checked = {}
+        # (path, days, points) -> ((file size, mtime), frame) of the last downsampled series
+        self._frames = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, coin, currency):
+        return os.path.join(self.directory, f"{coin}-{currency.lower()}.f64")
+
+    def _series_lock(self, path):
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    # --- Cache files ---
+    def cached(self, coin, currency):
+        """The cached (n, 2) series, oldest first, with duplicate points dropped."""
+        path = self._path(coin, currency)
+        if not os.path.exists(path):
+            return np.empty((0, 2))
+        data = np.fromfile(path, dtype=np.float64)
+        data = data[:len(data) // 2 * 2].reshape(-1, 2)
+        if len(data) > 1:
+            # Appends from concurrent processes can overlap; keep strictly increasing times
+            data = data[np.concatenate(([True], data[1:, 0] > np.maximum.accumulate(data[:-1, 0])))]
+        return data
+
+    def _append(self, path, points):
+        with open(path, "ab") as f:
+            f.write(np.ascontiguousarray(points, dtype=np.float64).tobytes())
+
+    def _rewrite(self, path, points):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        np.ascontiguousarray(points, dtype=np.float64).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _covered_from(self, path):
+        """Earliest start ever fetched for a series; coins listed later have no points that far back."""
+        try:
+            with open(path + ".from") as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _set_covered_from(self, path, start):
+        tmp_path = f"{path}.from.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(repr(float(start)))
+        os.replace(tmp_path, path + ".from")
+
+    # --- Fetching ---
+    def fetch(self, coin, currency, start, end):
+        """Prices in [start, end] (unix seconds) from CoinGecko as an (n, 2) array.
+
+        The range is widened to whole days at the start and REFRESH_SECONDS
+        at the end, so every session in a refresh window sends the same
+        request and recorded cassettes match on replay.
+        """
+        start = math.floor(start / 86400) * 86400
+        end = math.ceil(end / REFRESH_SECONDS) * REFRESH_SECONDS
+
+        def get():
+            # Checked inside `call`, so error statuses and bad bodies count as failures
+            response = self.session.get(
+                f"{self.api_base}/coins/{coin}/market_chart/range",
+                params={"vs_currency": currency.lower(), "from": int(start), "to": int(end)},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()["prices"]
+
+        prices = self.call(get)
+        if not prices:
+            return np.empty((0, 2))
+        points = np.asarray(prices, dtype=np.float64)
+        points[:, 0] /= 1000.0
+        return points[np.argsort(points[:, 0], kind="stable")]
+
+    def refresh(self, coin, currency, days=HISTORY_DAYS, now=None):
+        """Extend the cache to cover the last `days` up to now, fetching only what's missing."""
+        now = time.time() if now is None else now
+        start = now - days * 86400
+        path = self._path(coin, currency)
+        with self._series_lock(path):
+            # Skip the disk read too when this process refreshed recently
+            if now - self._checked.get((path, days), 0.0) < REFRESH_SECONDS:
+                return
+            cached = self.cached(coin, currency)
+            if not len(cached):
+                self._rewrite(path, self.fetch(coin, currency, start, now))
+                self._set_covered_from(path, start)
+            else:
+                first, last = cached[0, 0], cached[-1, 0]
+                covered = min(first, self._covered_from(path) or first)
+                if start < covered - 86400:
+                    # A longer window than ever asked for: backfill once, then keep appending
+                    older = self.fetch(coin, currency, start, first)
+                    self._rewrite(path, np.concatenate([older[older[:, 0] < first], cached]))
+                    self._set_covered_from(path, start)
+                if now - last >= REFRESH_SECONDS:
+                    newer = self.fetch(coin, currency, last, now)
+                    self._append(path, newer[newer[:, 0] > last])
+            self._checked[(path, days)] = now
+
+    def series(self, coin, currency, days=HISTORY_DAYS, points=CHART_POINTS, now=None):
+        """A chart-ready frame of the last `days`, LTTB-downsampled to `points`.
+
+        Returns (frame, fresh); fresh is False when the refresh failed and
+        the frame holds only what was cached before.
+        """
+        now = time.time() if now is None else now
+        fresh = True
+        try:
+            self.refresh(coin, currency, days, now)
+        except Exception:
+            fresh = False
+        path = self._path(coin, currency)
+        try:
+            stat = os.stat(path)
+            version = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            version = None
+        key = (path, days, points)
+        # Reruns between refreshes reuse the frame instead of re-reading and re-downsampling the file
+        memo = self._frames.get(key)
+        if memo is not None and version is not None and memo[0] == version:
+            return memo[1], fresh
+        data = self.cached(coin, currency)
+        data = data[data[:, 0] >= now - days * 86400]
+        data = downsample(data, points)
+        frame = pd.DataFrame({"Date": pd.to_datetime(data[:, 0], unit="s"), "Price": data[:, 1]})
+        if version is not None:
+            self._frames[key] = (version, frame)
+        return frame, fresh
+
+
+def chart_spec(currency, height=220):
+    """A minimal Vega-Lite line spec for series() frames.
+
+    Passing a spec straight to st.vega_lite_chart skips building an Altair
+    chart on every rerun, which costs far more than drawing the points.
+    """
+    return {
+        "height": height,
+        "mark": {"type": "line", "tooltip": True},
+        "encoding": {
+            "x": {"field": "Date", "type": "temporal", "title": None},
+            "y": {"field": "Price", "type": "quantitative", "title": currency, "scale": {"zero": False}},
+        },
+    }
@@ -0,0 +1,249 @@
+import calendar
+import datetime as dt
+import heapq
+from collections import defaultdict
+
+import pandas as pd
+
+from expense_store import GRANULARITIES, MAX_CHART_POINTS, bucket_key, downsample_sums, memoized, to_date
+from fx import BASE_CURRENCY
+
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+
+def _add_months(date, months, day):
+    """The `day`-th of the month `months` after date, clamped to the month's end."""
+    index = date.year * 12 + (date.month - 1) + months
+    year, month = index // 12, index % 12 + 1
+    return dt.date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+class RecurringRule:
+    """An expense that repeats on a fixed schedule, e.g. rent on the 1st.
+
+    A rule is stored once and never turned into ledger rows. Occurrences in
+    a window are located by arithmetic, so counting them is O(1) and listing
+    them only touches the dates inside the window.
+    """
+
+    def __init__(self, category, amount, start, frequency="monthly", interval=1,
+                 end=None, currency=BASE_CURRENCY, name=None):
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency: {frequency}")
+        if int(interval) < 1:
+            raise ValueError("interval must be at least 1")
+        self.category = category
+        self.amount = float(amount)
+        self.start = to_date(start)
+        self.frequency = frequency
+        self.interval = int(interval)
+        self.end = to_date(end) if end is not None else None
+        self.currency = currency
+        self.name = name or category
+
+    def __repr__(self):
+        return (f"RecurringRule({self.category!r}, {self.amount!r}, {self.start.isoformat()!r}, "
+                f"{self.frequency!r}, interval={self.interval})")
+
+    def describe(self):
+        unit = {"daily": "day", "weekly": "week", "monthly": "month", "yearly": "year"}[self.frequency]
+        every = f"every {unit}" if self.interval == 1 else f"every {self.interval} {unit}s"
+        return f"{self.name}: {self.amount:,.2f} {self.currency} {every} from {self.start:%b %d, %Y}"
+
+    def _nth(self, k):
+        """Date of the k-th occurrence, counting the start as 0."""
+        if self.frequency == "daily":
+            return self.start + dt.timedelta(days=k * self.interval)
+        if self.frequency == "weekly":
+            return self.start + dt.timedelta(weeks=k * self.interval)
+        months = k * self.interval * (12 if self.frequency == "yearly" else 1)
+        return _add_months(self.start, months, self.start.day)
+
+    def _first_index(self, date):
+        """Index of the first occurrence on or after date."""
+        if date <= self.start:
+            return 0
+        if self.frequency in ("daily", "weekly"):
+            step = self.interval * (7 if self.frequency == "weekly" else 1)
+            return -(-(date - self.start).days // step)
+        step = self.interval * (12 if self.frequency == "yearly" else 1)
+        months = (date.year - self.start.year) * 12 + (date.month - self.start.month)
+        k = max(-(-months // step), 0)
+        # Same month as date but earlier in it
+        return k + 1 if self._nth(k) < date else k
+
+    def _bounds(self, start, end):
+        """Occurrence index range [first, stop) falling inside [start, end]."""
+        end = to_date(end)
+        if self.end is not None:
+            end = min(end, self.end)
+        first = self._first_index(to_date(start) if start is not None else self.start)
+        stop = self._first_index(end + dt.timedelta(days=1)) if end >= self.start else 0
+        return first, max(stop, first)
+
+    def count_between(self, start=None, end=None):
+        first, stop = self._bounds(start, end)
+        return stop - first
+
+    def occurrences(self, start=None, end=None):
+        """Yield occurrence dates in [start, end]; end defaults to today."""
+        first, stop = self._bounds(start, end)
+        for k in range(first, stop):
+            yield self._nth(k)
+
+
+def _occurrence_stream(rule, start, end):
+    for date in rule.occurrences(start, end):
+        yield date, rule.category, rule.amount, rule.currency
+
+
+class RecurringSchedule:
+    """The session's recurring rules, expanded lazily over report windows.
+
+    Aggregates mirror ExpenseStore's so callers can merge the two: amounts
+    are per-category (amount, count) pairs, converted like the store's.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.version = 0
+        self._memo = {}
+        self._memo_version = 0
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def add(self, rule):
+        self.rules.append(rule)
+        self.version += 1
+        return len(self.rules) - 1
+
+    def remove(self, index):
+        del self.rules[index]
+        self.version += 1
+
+    def first_date(self):
+        return min((rule.start for rule in self.rules), default=None)
+
+    def _matching(self, categories):
+        if not categories:
+            return self.rules
+        wanted = set(categories)
+        return [rule for rule in self.rules if rule.category in wanted]
+
+    def expand(self, start=None, end=None, categories=None):
+        """Yield (date, category, amount, currency) in date order without building a list."""
+        streams = [_occurrence_stream(rule, start, end) for rule in self._matching(categories)]
+        return heapq.merge(*streams, key=lambda occurrence: occurrence[0])
+
+    def totals_between(self, start=None, end=None, categories=None, currency=BASE_CURRENCY, fx=None):
+        """Return {category: (amount, count)} for [start, end], counted arithmetically."""
+        categories = tuple(sorted(categories)) if categories else None
+        return self._totals_between(to_date(start) if start is not None else None, to_date(end),
+                                    categories, currency, fx)
+
+    @memoized
+    def _totals_between(self, start, end, categories, currency, fx):
+        totals = {}
+        for rule in self._matching(categories):
+            count = rule.count_between(start, end)
+            if not count:
+                continue
+            factor = fx.factor(rule.currency, currency) if fx is not None else 1.0
+            amount, seen = totals.get(rule.category, (0.0, 0))
+            totals[rule.category] = (amount + rule.amount * count * factor, seen + count)
+        return totals
+
+    @memoized
+    def rollup_cells(self, granularity, start=None, end=None, currency=BASE_CURRENCY, fx=None):
+        """Return {(period, category): [amount, count]} for occurrences in [start, end]."""
+        cells = defaultdict(lambda: [0.0, 0])
+        for date, category, amount, from_currency in self.expand(start, end):
+            cell = cells[(bucket_key(date, granularity), category)]
+            cell[0] += amount * (fx.factor(from_currency, currency) if fx is not None else 1.0)
+            cell[1] += 1
+        return dict(cells)
+
+    def period_totals(self, granularity, start=None, end=None, currency=BASE_CURRENCY, fx=None):
+        """Total recurring spend per bucket, oldest first."""
+        totals = defaultdict(float)
+        for (period, _), (amount, _) in self.rollup_cells(granularity, start, end, currency, fx).items():
+            totals[period] += amount
+        return sorted(totals.items())
+
+    def summary(self, start=None, end=None, currency=BASE_CURRENCY, fx=None):
+        """One row per rule with its occurrences and converted total in [start, end]."""
+        rows = []
+        for rule in self.rules:
+            count = rule.count_between(start, end)
+            factor = fx.factor(rule.currency, currency) if fx is not None else 1.0
+            rows.append((rule.describe(), rule.category, count, rule.amount * count * factor))
+        return pd.DataFrame(rows, columns=["Rule", "Category", "Occurrences", f"Total ({currency})"])
+
+    def rollup(self, granularity, start=None, end=None, currency=BASE_CURRENCY, fx=None):
+        """Rollup frame in the same shape as ExpenseStore.rollup()."""
+        cells = self.rollup_cells(granularity, start, end, currency, fx)
+        return pd.DataFrame(
+            [(period, category, amount, count) for (period, category), (amount, count) in cells.items()],
+            columns=["Period", "Category", "Amount", "Count"]
+        )
+
+
+# --- Combining with the ledger ---
+def merge_totals(*totals):
+    """Merge {category: (amount, count)} mappings."""
+    merged = {}
+    for mapping in totals:
+        for category, (amount, count) in mapping.items():
+            seen_amount, seen_count = merged.get(category, (0.0, 0))
+            merged[category] = (seen_amount + amount, seen_count + count)
+    return merged
+
+
+def merge_series(*series):
+    """Merge sorted (period, amount) lists, summing shared periods."""
+    merged = defaultdict(float)
+    for points in series:
+        for period, amount in points:
+            merged[period] += amount
+    return sorted(merged.items())
+
+
+def merge_rollups(*frames, limit=None):
+    """Merge rollup frames, newest buckets first."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["Period", "Category", "Amount", "Count"])
+    merged = (
+        pd.concat(frames, ignore_index=True)
+        .groupby(["Period", "Category"], as_index=False)[["Amount", "Count"]].sum()
+        .sort_values(["Period", "Category"], ascending=False, ignore_index=True)
+    )
+    return merged if limit is None else merged.head(limit)
+
+
+def combined_category_totals(store, schedule, end, currency=BASE_CURRENCY, fx=None):
+    """Spending per category from the ledger plus recurring charges up to end."""
+    totals = dict(store.category_totals(currency, fx))
+    for category, (amount, _) in schedule.totals_between(None, end, currency=currency, fx=fx).items():
+        totals[category] = totals.get(category, 0.0) + amount
+    return totals
+
+
+def combined_chart_series(store, schedule, end, currency=BASE_CURRENCY, fx=None, max_points=MAX_CHART_POINTS):
+    """Like ExpenseStore.chart_series(), with recurring charges up to end folded in."""
+    if not len(schedule):
+        return store.chart_series(max_points, currency, fx)
+    for granularity in GRANULARITIES:
+        series = merge_series(
+            store.period_totals(granularity, currency, fx),
+            schedule.period_totals(granularity, None, end, currency, fx)
+        )
+        if len(series) <= max_points:
+            break
+    series = downsample_sums(series, max_points)
+    return pd.DataFrame(series, columns=["Period", "Amount"]).set_index("Period")
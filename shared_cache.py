@@ -0,0 +1,222 @@
+"""A key-value cache shared by every process on the host.
+
+st.cache_resource and in-memory dicts are per process, so several
+Streamlit servers on one machine would each warm their own copies of
+prices, intent labels and model answers. SharedCache keeps them in one
+SQLite file instead: reads and writes are single statements under WAL,
+entries can expire, and the least recently used are evicted once the
+file's entries exceed a size budget.
+
+TieredCache puts a small in-process LRU in front of one namespace of a
+SharedCache, so hot keys don't touch SQLite at all.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from paths import data_path
+
+
+MAX_BYTES = int(float(os.environ.get("FINANCEBOT_CACHE_MB", 64)) * 1024 * 1024)
+# Run eviction after this many writes from one process
+EVICT_EVERY = 200
+# Reads refresh an entry's access time at most this often
+ACCESS_RESOLUTION = 60.0
+# In-process copies are re-read from SQLite after this long, to see other processes' writes
+L1_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at);
+"""
+
+
+class SharedCache:
+    """SQLite-backed cache of JSON values, safe across threads and processes.
+
+    Values are stored with the time they were written, so callers can ask
+    for entries no older than some age, or take any age when serving a
+    last-known-good value. `ttl` on set is a hard expiry after which the
+    entry is gone for everyone.
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_BYTES, clock=time.time):
+        self.path = path or data_path("cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, max_age=None):
+        """Return (value, age in seconds), or None if missing, expired or older than max_age."""
+        conn = self._connect()
+        now = self.clock()
+        row = conn.execute(
+            "SELECT value, stored_at, expires_at, accessed_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, stored_at, expires_at, accessed_at = row
+        if expires_at is not None and expires_at <= now:
+            return None
+        age = max(now - stored_at, 0.0)
+        if max_age is not None and age > max_age:
+            return None
+        if now - accessed_at >= ACCESS_RESOLUTION:
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+        return json.loads(value), age
+
+    def set(self, namespace, key, value, ttl=None):
+        """Insert or replace an entry in one atomic statement."""
+        self._put(self._connect(), namespace, key, value, ttl)
+        self._wrote()
+
+    def _put(self, conn, namespace, key, value, ttl):
+        now = self.clock()
+        encoded = json.dumps(value)
+        conn.execute(
+            "INSERT INTO cache (namespace, key, value, size, stored_at, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+            " stored_at = excluded.stored_at, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+            (namespace, key, encoded, len(encoded) + len(namespace) + len(key), now,
+             now + ttl if ttl is not None else None, now)
+        )
+
+    def update(self, namespace, key, func, ttl=None):
+        """Atomically replace an entry with func(current value or None) and return the result."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = self.get(namespace, key)
+            value = func(current[0] if current is not None else None)
+            self._put(conn, namespace, key, value, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._wrote()
+        return value
+
+    def delete(self, namespace, key):
+        self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._connect().execute("DELETE FROM cache")
+        else:
+            self._connect().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+
+    # --- Eviction ---
+    def _wrote(self):
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under 90% of max_bytes."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (self.clock(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            excess = total - int(self.max_bytes * 0.9) if total > self.max_bytes else 0
+            if excess > 0:
+                victims, freed = [], 0
+                for namespace, key, size in conn.execute(
+                    "SELECT namespace, key, size FROM cache ORDER BY accessed_at"
+                ):
+                    victims.append((namespace, key))
+                    freed += size
+                    if freed >= excess:
+                        break
+                conn.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self):
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+
+class TieredCache:
+    """One namespace of a SharedCache behind an in-process LRU.
+
+    `get` returns values fresher than `ttl` (any age when ttl is None),
+    checking the LRU first; `get_stale` ignores ttl and always reads
+    SQLite, for serving last-known-good values during outages.
+    """
+
+    def __init__(self, shared, namespace, ttl=None, max_entries=1024, l1_seconds=L1_SECONDS):
+        self.shared = shared
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.l1_seconds = l1_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value, age):
+        now = time.monotonic()
+        # Keep the local copy no longer than the entry has left to live
+        keep = self.l1_seconds if self.ttl is None else min(self.l1_seconds, self.ttl - age)
+        with self._lock:
+            self._entries[key] = (value, now + keep)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+        found = self.shared.get(self.namespace, key, max_age=self.ttl)
+        if found is None:
+            return None
+        value, age = found
+        self._remember(key, value, age)
+        return value
+
+    def get_stale(self, key):
+        """Return (value, age in seconds) of the entry whatever its age, or None."""
+        return self.shared.get(self.namespace, key)
+
+    def set(self, key, value, ttl=None):
+        """Store value in both tiers; ttl is a hard expiry in SQLite."""
+        self.shared.set(self.namespace, key, value, ttl)
+        self._remember(key, value, 0.0)
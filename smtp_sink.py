@@ -0,0 +1,140 @@
+"""Local SMTP sink that accepts every message and keeps it.
+
+Stands in for a real mail server in development and tests:
+
+    python smtp_sink.py --port 8025 --outbox .financebot/outbox
+
+then run the app with SMTP_HOST=localhost SMTP_PORT=8025. In code, use it
+as a context manager and inspect `sink.messages`.
+"""
+import argparse
+import email
+import email.policy
+import os
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server.sink
+        sender, recipients = None, []
+        self._reply("220 financebot-sink ESMTP ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            command = line[:4].upper()
+
+            if command in ("HELO", "EHLO"):
+                if command == "EHLO":
+                    self._reply("250-financebot-sink")
+                    self._reply("250 8BITMIME")
+                else:
+                    self._reply("250 financebot-sink")
+            elif command == "MAIL":
+                sender, recipients = line.split(":", 1)[1].strip().strip("<>"), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                chunks = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing
+                    chunks.append(data[1:] if data.startswith(b"..") else data)
+                sink.deliver(sender, recipients, b"".join(chunks))
+                sender, recipients = None, []
+                self._reply("250 OK: queued")
+            elif command == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif command == "NOOP":
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """Threaded SMTP server that records every message it receives."""
+
+    def __init__(self, host="localhost", port=0, outbox=None):
+        self.outbox = outbox
+        self.messages = []
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def deliver(self, sender, recipients, data):
+        message = email.message_from_bytes(data, policy=email.policy.default)
+        with self._lock:
+            self.messages.append(message)
+            count = len(self.messages)
+        if self.outbox:
+            os.makedirs(self.outbox, exist_ok=True)
+            path = os.path.join(self.outbox, f"{time.time():.6f}-{count}.eml")
+            with open(path, "wb") as f:
+                f.write(data)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # shutdown() waits for serve_forever, so would hang if never started
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink for FinanceBot emails.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--outbox", help="Directory to write received messages to as .eml files")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.outbox)
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
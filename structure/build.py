@@ -0,0 +1,197 @@
+"""Incremental, parallel build of the diagrams in assets/.
+
+Each generator in structure/ is content-hashed together with its inputs
+and the version of the library that draws it. Diagrams whose hash and
+output match the last build are skipped; the rest render in parallel
+worker processes, each in a scratch directory so generators that write to
+the working directory cannot collide:
+
+    python structure/build.py                 # rebuild what changed
+    python structure/build.py flow --force    # re-render one diagram
+    python structure/build.py --dry-run       # list stale diagrams
+
+Hashes of the last successful build are kept in structure/.build-manifest.json.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import metadata
+
+
+STRUCTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(STRUCTURE_DIR)
+ASSETS_DIR = os.path.join(ROOT, "assets")
+MANIFEST_PATH = os.path.join(STRUCTURE_DIR, ".build-manifest.json")
+# Bump to invalidate every diagram, e.g. after changing how they are built
+BUILD_VERSION = 1
+
+
+class DiagramSpec:
+    """A generator script, the files it reads and the images it writes to assets/."""
+
+    def __init__(self, name, script, outputs, inputs=(), packages=()):
+        self.name = name
+        self.script = script
+        self.outputs = list(outputs)
+        # Paths relative to the repo root, copied into the scratch directory
+        self.inputs = list(inputs)
+        self.packages = list(packages)
+
+    def fingerprint(self):
+        """Hash of everything that determines the rendered images."""
+        digest = hashlib.sha256(f"build {BUILD_VERSION}\n".encode())
+        for path in [os.path.join(STRUCTURE_DIR, self.script)] + [os.path.join(ROOT, p) for p in self.inputs]:
+            digest.update(os.path.relpath(path, ROOT).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        for package in self.packages:
+            try:
+                version = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                version = "missing"
+            digest.update(f"{package}=={version}\n".encode())
+        return digest.hexdigest()
+
+
+DIAGRAMS = [
+    DiagramSpec("architecture", "diagram.py", ["financebot_architecture_revised.png"], packages=["matplotlib"]),
+    DiagramSpec("flow", "flow_diagram.py", ["financebot_conversation_flow.png"], packages=["graphviz"]),
+    DiagramSpec(
+        "full_architecture", "diagram_general.py",
+        ["financebot_full_architecture_(gpt-4o_enhanced).png"],
+        inputs=["assets/chatgpt.png", "assets/coingeck.png"],
+        packages=["diagrams"]
+    ),
+]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def is_current(spec, fingerprint, manifest):
+    """Whether the last build of spec used the same inputs and its outputs are untouched."""
+    entry = manifest.get(spec.name)
+    if entry is None or entry["fingerprint"] != fingerprint:
+        return False
+    for output in spec.outputs:
+        path = os.path.join(ASSETS_DIR, output)
+        if not os.path.exists(path) or file_hash(path) != entry["outputs"].get(output):
+            return False
+    return True
+
+
+# --- Rendering (runs in worker processes) ---
+def render(spec):
+    """Run one generator in a scratch directory and move its images into assets/.
+
+    Returns (name, seconds, {output: hash}).
+    """
+    started = time.perf_counter()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"diagram-{spec.name}-") as scratch:
+        for path in spec.inputs:
+            shutil.copy(os.path.join(ROOT, path), scratch)
+        os.chdir(scratch)
+        try:
+            # Generators print progress; keep the build report readable
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                runpy.run_path(os.path.join(STRUCTURE_DIR, spec.script), run_name="__main__")
+        finally:
+            os.chdir(cwd)
+
+        hashes = {}
+        for output in spec.outputs:
+            produced = os.path.join(scratch, output)
+            if not os.path.exists(produced):
+                raise RuntimeError(f"{spec.script} did not write {output}")
+            hashes[output] = file_hash(produced)
+            shutil.move(produced, os.path.join(ASSETS_DIR, output))
+    return spec.name, time.perf_counter() - started, hashes
+
+
+def build(names=None, force=False, jobs=None, dry_run=False):
+    """Render stale diagrams in parallel. Returns {name: (status, seconds, detail)}."""
+    specs = [spec for spec in DIAGRAMS if not names or spec.name in names]
+    manifest = load_manifest()
+    results = {}
+    stale = []
+    for spec in specs:
+        fingerprint = spec.fingerprint()
+        if not force and is_current(spec, fingerprint, manifest):
+            results[spec.name] = ("unchanged", 0.0, "")
+        else:
+            stale.append((spec, fingerprint))
+    if dry_run or not stale:
+        results.update({spec.name: ("stale", 0.0, "") for spec, _ in stale})
+        return results
+
+    fingerprints = {spec.name: fingerprint for spec, fingerprint in stale}
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(stale))) as pool:
+        futures = {pool.submit(render, spec): spec for spec, _ in stale}
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                name, seconds, hashes = future.result()
+            except Exception as e:
+                results[spec.name] = ("failed", 0.0, str(e))
+                continue
+            results[name] = ("built", seconds, "")
+            manifest[name] = {"fingerprint": fingerprints[name], "outputs": hashes}
+            # Saved per diagram so an interrupted build keeps finished work
+            save_manifest(manifest)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the diagrams in assets/ that are out of date.")
+    parser.add_argument("names", nargs="*", help=f"Diagrams to consider (default: all of {', '.join(s.name for s in DIAGRAMS)})")
+    parser.add_argument("--force", action="store_true", help="Render even if nothing changed")
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which diagrams are stale")
+    args = parser.parse_args()
+    unknown = set(args.names) - {spec.name for spec in DIAGRAMS}
+    if unknown:
+        parser.error(f"Unknown diagrams: {', '.join(sorted(unknown))}")
+
+    started = time.perf_counter()
+    results = build(args.names, args.force, args.jobs, args.dry_run)
+    for name in (spec.name for spec in DIAGRAMS if spec.name in results):
+        status, seconds, detail = results[name]
+        timing = f"{seconds:6.2f} s" if status == "built" else " " * 8
+        print(f"{name:<18} {status:<9} {timing}  {detail}".rstrip())
+    print(f"Done in {time.perf_counter() - started:.2f} s")
+    sys.exit(1 if any(status == "failed" for status, _, _ in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,22 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from matplotlib.path import Path
 import numpy as np
-from matplotlib import font_manager
 import matplotlib as mpl
 
 
 plt.rcParams['figure.dpi'] = 300
 plt.rcParams['savefig.dpi'] = 300
 
-# Add professional font if available, otherwise use default
-try:
-    # For Windows
-    font_path = 'C:/Windows/Fonts/segoeui.ttf'  
-    prop = font_manager.FontProperties(fname=font_path)
-    plt.rcParams['font.family'] = prop.get_name()
-except:
-    plt.rcParams['font.family'] = 'sans-serif'
-    
 # Set modern style
 plt.style.use('seaborn-v0_8-whitegrid')
 mpl.rcParams['axes.grid'] = False
 
+# Professional font if installed, chosen by family name rather than a
+# Windows-only path; set after the style, which brings its own font list.
+# DejaVu Sans ships with matplotlib, so the lookup always succeeds.
+plt.rcParams['font.family'] = 'sans-serif'
+plt.rcParams['font.sans-serif'] = ['Segoe UI', 'Helvetica Neue', 'Arial', 'DejaVu Sans']
+
 def draw_rounded_rectangle(ax, x, y, width, height, radius=0.1, color='white', alpha=1.0, linewidth=1.5):
     """Draw a rectangle with rounded corners."""
     # Define the path
@@ -230,7 +226,7 @@ def create_financebot_architecture():
     plt.savefig('financebot_architecture_revised.png', dpi=300, bbox_inches='tight', transparent=False)
     plt.close()
     
-    print("Enhanced architecture diagram saved as 'financebot_architecture.png'")
+    print("Enhanced architecture diagram saved as 'financebot_architecture_revised.png'")
 
 if __name__ == "__main__":
     create_financebot_architecture()
@@ -0,0 +1,29 @@
+from anomaly import AnomalyDetector
+
+
+def trained(category, amounts):
+    detector = AnomalyDetector()
+    assert detector.observe_many((category, amount) for amount in amounts) == []
+    return detector
+
+
+def test_small_change_to_a_constant_charge_is_not_flagged():
+    detector = trained("Entertainment", [15.99] * 6)
+    assert detector.check("Entertainment", 16.99) is None
+
+
+def test_low_variance_history_tolerates_ordinary_increases():
+    detector = trained("Dining Out", [4.50, 4.50, 4.75, 4.50, 4.50, 4.25, 4.50])
+    assert detector.check("Dining Out", 6.00) is None
+
+
+def test_large_jump_over_a_constant_history_is_flagged():
+    detector = trained("Entertainment", [15.99] * 6)
+    anomaly = detector.check("Entertainment", 120.00)
+    assert anomaly is not None and anomaly.amount == 120.00
+
+
+def test_outlier_against_a_varied_history_is_flagged():
+    detector = trained("Groceries", [42, 55, 38, 61, 47, 52, 44, 58])
+    assert detector.check("Groceries", 400) is not None
+    assert detector.check("Groceries", 65) is None
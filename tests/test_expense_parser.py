@@ -0,0 +1,58 @@
+import datetime as dt
+
+import pytest
+
+from expense_parser import parse_bulk, parse_expense_message
+
+
+TODAY = dt.date(2026, 10, 19)
+
+
+def logged(text):
+    result = parse_expense_message(text, TODAY)
+    assert result is not None and result.ok, text
+    return [(e.category, e.amount, e.date) for e in result.expenses]
+
+
+@pytest.mark.parametrize("text", [
+    "Set my grocery budget to 400",
+    "Help me create a budget with $2000 for rent",
+    "I want to invest 500 in a game company",
+    "My rent is 1500, help me plan",
+    "Show me my spending report for the last 30 days",
+    "How much did I spend on groceries?",
+])
+def test_other_intents_are_not_logged(text):
+    assert parse_expense_message(text, TODAY) is None
+
+
+def test_counts_times_and_ordinals_are_not_amounts():
+    assert logged("Spent 40 on lunch with 2 friends") == [("Dining Out", 40.0, TODAY)]
+    assert logged("Paid $12 for an uber at 5pm") == [("Transportation", 12.0, TODAY)]
+    assert logged("Paid 12 for an uber at 5:30") == [("Transportation", 12.0, TODAY)]
+    assert logged("Paid $30 for dinner on the 15th") == [("Dining Out", 30.0, TODAY)]
+    assert logged("Spent $80 on my 30th birthday dinner") == [("Dining Out", 80.0, TODAY)]
+    assert logged("Bought 2 tickets for $30") == [("Entertainment", 30.0, TODAY)]
+
+
+def test_several_bare_numbers_in_one_segment_go_to_the_form():
+    result = parse_expense_message("Spent 40 on lunch for 3", TODAY)
+    assert result.ambiguous and not result.ok
+    assert result.amount_hint == 40.0
+
+
+def test_a_date_applies_only_to_its_segment():
+    yesterday = TODAY - dt.timedelta(days=1)
+    assert logged("$42 on groceries and $15 on lunch yesterday") == [
+        ("Groceries", 42.0, TODAY), ("Dining Out", 15.0, yesterday),
+    ]
+    assert logged("Yesterday, I spent $42 on groceries and $15 on lunch") == [
+        ("Groceries", 42.0, yesterday), ("Dining Out", 15.0, yesterday),
+    ]
+
+
+def test_bulk_lines_need_no_spending_cue():
+    results = [r for _, _, r in parse_bulk(["$42 groceries yesterday", "coffee 4.50, uber 12"], TODAY)]
+    assert [[(e.category, e.amount) for e in r.expenses] for r in results] == [
+        [("Groceries", 42.0)], [("Dining Out", 4.5), ("Transportation", 12.0)],
+    ]
@@ -0,0 +1,56 @@
+import datetime as dt
+import threading
+import time
+
+import idle_sessions
+from expense_store import ExpenseStore
+from idle_sessions import ChatHistory, IdleSessionManager
+
+
+def new_state(rows=0):
+    state = {"expenses": ExpenseStore(), "chat_history": ChatHistory()}
+    for i in range(rows):
+        state["expenses"].add("Groceries", 10.0 + i, dt.date(2026, 1, 1))
+        state["chat_history"].append((f"I spent ${10 + i} on groceries", "Logged it."))
+    return state
+
+
+def test_spilled_session_is_restored_on_next_use(tmp_path):
+    manager = IdleSessionManager(str(tmp_path), idle_seconds=0.0)
+    state = new_state(rows=3)
+    with manager.using("a", state):
+        pass
+    manager.sweep()
+    assert len(state["expenses"]) == 0 and manager.stats()["spilled"] == 1
+
+    with manager.using("a", state):
+        assert len(state["expenses"]) == 3 and len(state["chat_history"]) == 3
+    assert manager.stats()["restores"] == 1
+
+
+def test_slow_spill_does_not_block_other_sessions(tmp_path, monkeypatch):
+    manager = IdleSessionManager(str(tmp_path), idle_seconds=0.0)
+    # The manager only holds weak references, so keep the session's state alive
+    slow_state = new_state(rows=3)
+    with manager.using("slow", slow_state):
+        pass
+
+    writing = threading.Event()
+    write_ledger = idle_sessions.write_ledger
+
+    def slow_write(path, expenses):
+        writing.set()
+        time.sleep(0.5)
+        write_ledger(path, expenses)
+
+    monkeypatch.setattr(idle_sessions, "write_ledger", slow_write)
+    sweeper = threading.Thread(target=manager.sweep)
+    sweeper.start()
+    assert writing.wait(5)
+
+    started = time.perf_counter()
+    with manager.using("other", new_state()):
+        pass
+    assert time.perf_counter() - started < 0.25
+    sweeper.join()
+    assert len(slow_state["expenses"]) == 0 and manager.stats()["spills"] == 1
@@ -0,0 +1,50 @@
+import datetime as dt
+
+import pytest
+
+from ledger_query import parse_question
+
+
+TODAY = dt.date(2026, 10, 19)
+
+
+@pytest.mark.parametrize("text", [
+    "What is the total cost of a Tesla?",
+    "How much does it cost to eat out in Paris?",
+    "Show me my spending report",
+    "Give me a summary of my expenses",
+    "Where am I spending too much?",
+    "How much should I spend on rent?",
+])
+def test_general_questions_go_to_the_model(text):
+    assert parse_question(text, TODAY) is None
+
+
+@pytest.mark.parametrize("text, aggregate, categories", [
+    ("How much did I spend on groceries this month?", "sum", ["Groceries"]),
+    ("What was my biggest expense this week?", "max", []),
+    ("How many dining out expenses did I log last week?", "count", ["Dining Out"]),
+    ("How much have I spent on coffee?", "sum", ["Dining Out"]),
+    ("What is my average grocery expense?", "average", ["Groceries"]),
+])
+def test_questions_about_own_spending_are_answered_locally(text, aggregate, categories):
+    query = parse_question(text, TODAY)
+    assert (query.aggregate, query.categories) == (aggregate, categories)
+
+
+@pytest.mark.parametrize("text, start, end", [
+    ("How much did I spend in 2025?", dt.date(2025, 1, 1), dt.date(2025, 12, 31)),
+    ("How much did I spend last weekend?", dt.date(2026, 10, 17), dt.date(2026, 10, 18)),
+    ("How much did I spend yesterday?", dt.date(2026, 10, 18), dt.date(2026, 10, 18)),
+    ("How much did I spend last quarter?", dt.date(2026, 7, 1), dt.date(2026, 9, 30)),
+    ("What did I spend in Q1?", dt.date(2026, 1, 1), dt.date(2026, 3, 31)),
+    ("How much have I spent so far this year?", dt.date(2026, 1, 1), TODAY),
+])
+def test_windows(text, start, end):
+    query = parse_question(text, TODAY)
+    assert (query.start, query.end) == (start, end)
+
+
+def test_unrecognised_window_goes_to_the_model():
+    assert parse_question("How much did I spend over the holidays?", TODAY) is None
+    assert parse_question("How much did I spend on coffee?", TODAY).period == "so far"
@@ -0,0 +1,98 @@
+import time
+
+from jobs import JobQueue, WorkerPool
+from notifications import SUMMARY_JOB, TIPS_JOB, SMTPSettings, register_handlers, tips_payload
+from smtp_sink import SMTPSink
+
+
+USER = {"name": "Ada", "email": "ada@example.com", "income": 5000.0}
+
+
+def make_pool(tmp_path, sink, **queue_options):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), **queue_options)
+    pool = WorkerPool(queue)
+    register_handlers(pool, SMTPSettings(host=sink.host, port=sink.port, sender="FinanceBot <bot@localhost>"))
+    return queue, pool
+
+
+def test_tips_email_is_sent_and_captured(tmp_path):
+    with SMTPSink() as sink:
+        queue, pool = make_pool(tmp_path, sink)
+        queue.enqueue(TIPS_JOB, tips_payload(USER))
+
+        assert pool.run_once() == 1
+
+    assert queue.counts() == {"done": 1}
+    assert len(sink.messages) == 1
+    message = sink.messages[0]
+    assert message["To"] == "ada@example.com"
+    assert message["Subject"] == "Your FinanceBot financial tips"
+    assert "$1,000.00 a month" in message.get_content()
+
+
+def test_summary_emails_are_sent_in_one_batch(tmp_path):
+    payload = {
+        "name": "Ada", "email": "ada@example.com", "income": 5000.0, "expense_count": 1,
+        "total_spent": 42.0, "by_category": {"Groceries": 42.0},
+        "chat_history": [["I spent $42 on groceries", "Logged it."]], "include_tips": False,
+    }
+    with SMTPSink() as sink:
+        queue, pool = make_pool(tmp_path, sink)
+        for _ in range(3):
+            queue.enqueue(SUMMARY_JOB, payload)
+
+        assert pool.run_once() == 3
+
+    assert queue.counts() == {"done": 3}
+    assert [m["Subject"] for m in sink.messages] == ["Your FinanceBot session summary"] * 3
+    assert "Groceries: $42.00" in sink.messages[0].get_content()
+
+
+def test_unreachable_server_schedules_a_retry(tmp_path):
+    sink = SMTPSink()
+    queue, pool = make_pool(tmp_path, sink)
+    sink.stop()
+    queue.enqueue(TIPS_JOB, tips_payload(USER))
+
+    assert pool.run_once() == 1
+    assert queue.counts() == {"pending": 1}
+
+
+def test_short_handler_result_fails_the_whole_batch(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=1)
+    pool = WorkerPool(queue)
+    pool.register("noop", lambda payloads: [None])
+    queue.enqueue("noop", {})
+    queue.enqueue("noop", {})
+
+    assert pool.run_once() == 2
+    assert queue.counts() == {"failed": 2}
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, lease_seconds=0.0)
+    queue.enqueue("noop", {})
+
+    assert len(queue.claim()) == 1
+    time.sleep(0.01)
+    assert len(queue.claim()) == 1
+    time.sleep(0.01)
+    assert queue.claim() == []
+    assert queue.counts() == {"failed": 1}
+
+
+def test_worker_that_lost_its_lease_cannot_settle_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.0)
+    queue.enqueue("noop", {})
+    [stale] = queue.claim()
+    time.sleep(0.01)
+    queue.lease_seconds = 60.0
+    [current] = queue.claim()
+    assert current.lease_token != stale.lease_token
+
+    assert queue.complete(stale) is False
+    assert queue.fail(stale, RuntimeError("timed out")) is False
+    assert queue.counts() == {"running": 1}
+
+    assert queue.complete(current) is True
+    assert queue.counts() == {"done": 1}
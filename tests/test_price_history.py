@@ -0,0 +1,72 @@
+import numpy as np
+
+from price_history import REFRESH_SECONDS, PriceHistory
+
+
+DAY = 86400.0
+NOW = 1_790_000_123.0
+
+
+class FakeResponse:
+    def __init__(self, prices):
+        self.prices = prices
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"prices": self.prices}
+
+
+class FakeCoinGecko:
+    """Serves hourly prices from `listed` onward and records each request's range."""
+
+    def __init__(self, listed=NOW - 400 * DAY):
+        self.listed = listed
+        self.now = NOW
+        self.requests = []
+
+    def get(self, url, params, timeout):
+        start, end = params["from"], params["to"]
+        self.requests.append((start, end))
+        hours = np.arange(max(start, self.listed) // 3600 * 3600 + 3600, min(end, self.now) + 1, 3600)
+        return FakeResponse([[t * 1000, 100.0 + t % 7] for t in hours])
+
+
+def test_request_ranges_are_bucketed(tmp_path):
+    api = FakeCoinGecko()
+    for offset in (0.0, 1.0, 37.5):
+        PriceHistory(str(tmp_path / str(offset)), session=api).refresh("bitcoin", "usd", now=NOW + offset)
+    assert len(set(api.requests)) == 1
+    start, end = api.requests[0]
+    assert start % DAY == 0 and end % REFRESH_SECONDS == 0 and end >= NOW
+
+
+def test_short_history_is_not_backfilled_again(tmp_path):
+    # Listed 30 days ago, so the cache never reaches back the full year asked for
+    api = FakeCoinGecko(listed=NOW - 30 * DAY)
+    history = PriceHistory(str(tmp_path), session=api)
+    for step in range(4):
+        history.refresh("bitcoin", "usd", now=NOW + step * REFRESH_SECONDS)
+    starts = [start for start, _ in api.requests]
+    # One full fetch, then only incremental ones from the newest point
+    assert sum(start < NOW - 300 * DAY for start in starts) == 1
+    assert len(api.requests) == 4
+
+
+def test_series_reuses_the_frame_until_the_file_changes(tmp_path, monkeypatch):
+    api = FakeCoinGecko()
+    history = PriceHistory(str(tmp_path), session=api)
+    first, fresh = history.series("bitcoin", "usd", now=NOW)
+    assert fresh and len(first) == 500
+
+    reads = []
+    cached = history.cached
+    monkeypatch.setattr(history, "cached", lambda *args: reads.append(args) or cached(*args))
+    again, _ = history.series("bitcoin", "usd", now=NOW + 10)
+    assert again is first and reads == []
+
+    api.now = NOW + 2 * 3600
+    newer, _ = history.series("bitcoin", "usd", now=api.now)
+    assert newer is not first
+    assert newer["Date"].iloc[-1] > first["Date"].iloc[-1]